@@ -60,6 +60,7 @@ HIDDEN_IMPORTS = [
     "pdf2image",
     "pytesseract",
     "PyPDF2",
+    "pypdfium2",
     "pandas",
     "Pillow",
 ]
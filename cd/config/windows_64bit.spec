@@ -41,6 +41,7 @@ except ImportError:
         "pdf2image",
         "pytesseract",
         "PyPDF2",
+        "pypdfium2",
         "pandas",
         "Pillow"
     ]
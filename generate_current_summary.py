@@ -1,19 +1,29 @@
 #!/usr/bin/env python3
 """
 Generate summary for existing processed invoice data
+
+The script imports invoice_processor, which lives under src/, so install the package first
+(`poetry install` or `pip install -e .`) and then run it from the repository root, e.g.
+`poetry run python generate_current_summary.py`.
 """
 
 import pandas as pd
 from pathlib import Path
-import sys
+from typing import List
 import os
 
-# Add src to path to import modules
-sys.path.append(str(Path(__file__).parent / "src"))
+from pydantic import TypeAdapter
 
 from invoice_processor.models.invoice import FlatInvoiceRecord
 from invoice_processor.utils.summary_generator import InvoiceSummaryGenerator
 
+try:
+    # Optional: multithreaded CSV parsing into contiguous Arrow columns with vectorised null checks
+    import pyarrow  # noqa: F401
+    READ_CSV_OPTIONS = {"engine": "pyarrow", "dtype_backend": "pyarrow"}
+except ImportError:
+    READ_CSV_OPTIONS = {}
+
 def main():
     # Read the current CSV output
     csv_file = "data/output/processed_invoices_20250713_084012.csv"
@@ -22,20 +32,12 @@ def main():
         print(f"CSV file not found: {csv_file}")
         return
     
-    # Load data
-    df = pd.read_csv(csv_file)
+    # Load data, turning NaN into None column-wise instead of per cell
+    df = pd.read_csv(csv_file, **READ_CSV_OPTIONS)
+    df = df.astype(object).where(df.notna(), None)
     
-    # Convert to FlatInvoiceRecord objects
-    records = []
-    for _, row in df.iterrows():
-        record_dict = row.to_dict()
-        # Handle NaN values
-        for key, value in record_dict.items():
-            if pd.isna(value):
-                record_dict[key] = None
-        
-        record = FlatInvoiceRecord(**record_dict)
-        records.append(record)
+    # Validate all rows into FlatInvoiceRecord objects in one batched call
+    records = TypeAdapter(List[FlatInvoiceRecord]).validate_python(df.to_dict(orient="records"))
     
     # Generate summary
     summary_generator = InvoiceSummaryGenerator("data/output")
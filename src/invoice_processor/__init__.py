@@ -4,8 +4,7 @@ __version__ = "0.1.0"
 __author__ = "Your Name"
 __email__ = "your.email@example.com"
 
-from invoice_processor.models.invoice import Invoice, InvoiceHeader, InvoiceLineItem, FlatInvoiceRecord
-from invoice_processor.workflows.invoice_workflow import process_invoices, run_invoice_processing
+from .models.invoice import Invoice, InvoiceHeader, InvoiceLineItem, FlatInvoiceRecord
 
 __all__ = [
     "Invoice",
@@ -15,3 +14,11 @@ __all__ = [
     "process_invoices",
     "run_invoice_processing"
 ]
+
+
+def __getattr__(name):
+    # The workflow pulls in the AI, PDF and OCR libraries, so import it on first access only
+    if name in ("process_invoices", "run_invoice_processing"):
+        from .workflows import invoice_workflow
+        return getattr(invoice_workflow, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,43 +1,29 @@
-import json
+import hashlib
 import logging
 import os
-from typing import Optional
+from pathlib import Path
+from typing import Iterable, List, Optional
 
 import openai
+import orjson
 from anthropic import Anthropic
+from pydantic import TypeAdapter
 
 from invoice_processor.models.invoice import Invoice, InvoiceHeader, InvoiceLineItem
 
 logger = logging.getLogger(__name__)
 
+# Longer invoices are split into chunks of about this size so replies fit within max_tokens
+MAX_CHUNK_CHARS = 8000
 
-class AIExtractor:
-    """Extract structured invoice data using AI models"""
-    
-    def __init__(self):
-        self.openai_client = None
-        self.anthropic_client = None
-        
-        # Initialize OpenAI if API key is available
-        if os.getenv("OPENAI_API_KEY"):
-            self.openai_client = openai.OpenAI()
-        
-        # Initialize Anthropic if API key is available
-        anthropic_key = os.getenv("ANTHROPIC_API_KEY")
-        if anthropic_key and anthropic_key != "your_anthropic_api_key_here":
-            try:
-                self.anthropic_client = Anthropic(api_key=anthropic_key)
-            except Exception as e:
-                logger.warning(f"Failed to initialize Anthropic client: {e}")
-                self.anthropic_client = None
-    
-    def create_extraction_prompt(self, text: str) -> str:
-        """Create a prompt for AI-based invoice data extraction"""
-        return f"""
+_SYSTEM_ROLE = "You are an expert at extracting structured data from invoices."
+
+# Constant part of the extraction prompt, built once; the invoice text always goes last
+_PROMPT_PREFIX = """
 Extract structured invoice information from the following text. Return a JSON object with this exact structure:
 
-{{
-    "header": {{
+{
+    "header": {
         "invoice_number": "string or null",
         "invoice_date": "YYYY-MM-DD format or null",
         "due_date": "YYYY-MM-DD format or null",
@@ -50,17 +36,17 @@ Extract structured invoice information from the following text. Return a JSON ob
         "tax_amount": "decimal number or null",
         "subtotal": "decimal number or null",
         "currency": "string (USD, EUR, etc.) or null"
-    }},
+    },
     "line_items": [
-        {{
+        {
             "item_description": "string",
             "quantity": "decimal number or null",
             "unit_price": "decimal number or null",
             "line_total": "decimal number or null",
             "item_code": "string or null"
-        }}
+        }
     ]
-}}
+}
 
 Rules:
 - Extract all line items with their descriptions, quantities, prices, and totals
@@ -70,8 +56,90 @@ Rules:
 - Return only valid JSON, no additional text
 
 Invoice text:
-{text}
 """
+
+_SYSTEM_PROMPT = f"{_SYSTEM_ROLE}\n{_PROMPT_PREFIX}"
+
+# Cache keys cover the prompt as well as the text, so prompt changes invalidate cached results
+_CACHE_KEY_SEED = hashlib.blake2b(_SYSTEM_PROMPT.encode("utf-8"), digest_size=16)
+
+# Validate the header and the whole line item list in one call each
+_HEADER_ADAPTER = TypeAdapter(InvoiceHeader)
+_LINE_ITEM_ADAPTER = TypeAdapter(List[InvoiceLineItem])
+
+
+def parse_json_response(content: str) -> dict:
+    """Parse a model's JSON reply, tolerating a surrounding markdown code fence"""
+    content = content.strip()
+    if content.startswith("```"):
+        content = content.removeprefix("```json").removeprefix("```").removesuffix("```")
+    return orjson.loads(content)
+
+
+def split_text_into_chunks(text: str, max_chars: int = MAX_CHUNK_CHARS) -> List[str]:
+    """Split text on line boundaries into chunks of at most max_chars (longer lines stay whole)"""
+    chunks = []
+    current = []
+    current_len = 0
+    for line in text.splitlines():
+        if current and current_len + len(line) + 1 > max_chars:
+            chunks.append("\n".join(current))
+            current = []
+            current_len = 0
+        current.append(line)
+        current_len += len(line) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def merge_extractions(results: Iterable[Optional[dict]]) -> Optional[dict]:
+    """Merge per-chunk AI results: first non-null value per header field, all line items in order"""
+    header = {}
+    line_items = []
+    found = False
+    for result in results:
+        if not result:
+            continue
+        found = True
+        for key, value in (result.get("header") or {}).items():
+            if header.get(key) is None:
+                header[key] = value
+        line_items.extend(result.get("line_items") or [])
+    
+    if not found:
+        return None
+    return {"header": header, "line_items": line_items}
+
+
+class AIExtractor:
+    """Extract structured invoice data using AI models"""
+    
+    def __init__(self, openai_client=None, anthropic_client=None):
+        """Use the given clients, or create them from the API keys in the environment"""
+        self.openai_client = openai_client
+        self.anthropic_client = anthropic_client
+        
+        # Initialize OpenAI if API key is available
+        if self.openai_client is None and os.getenv("OPENAI_API_KEY"):
+            self.openai_client = openai.OpenAI()
+        
+        # Initialize Anthropic if API key is available
+        anthropic_key = os.getenv("ANTHROPIC_API_KEY")
+        if self.anthropic_client is None and anthropic_key and anthropic_key != "your_anthropic_api_key_here":
+            try:
+                self.anthropic_client = Anthropic(api_key=anthropic_key)
+            except Exception as e:
+                logger.warning(f"Failed to initialize Anthropic client: {e}")
+                self.anthropic_client = None
+        
+        # Optional on-disk cache of AI results so re-runs don't pay for the same text twice
+        cache_dir = os.getenv("AI_CACHE_DIR")
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+    
+    def create_extraction_prompt(self, text: str) -> str:
+        """Create a prompt for AI-based invoice data extraction"""
+        return _PROMPT_PREFIX + text
     
     def extract_with_openai(self, text: str) -> Optional[dict]:
         """Extract invoice data using OpenAI GPT models"""
@@ -85,19 +153,20 @@ Invoice text:
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are an expert at extracting structured data from invoices. Return only valid JSON."
+                        "content": _SYSTEM_PROMPT
                     },
                     {
                         "role": "user",
-                        "content": self.create_extraction_prompt(text)
+                        "content": text
                     }
                 ],
+                response_format={"type": "json_object"},  # API guarantees a valid JSON reply
                 temperature=0.1,  # Low temperature for consistent extraction
                 max_tokens=2000
             )
             
             content = response.choices[0].message.content
-            return json.loads(content)
+            return parse_json_response(content)
             
         except Exception as e:
             logger.error(f"Error extracting with OpenAI: {e}")
@@ -114,27 +183,60 @@ Invoice text:
                 model="claude-3-haiku-20240307",  # Fast and cost-effective
                 max_tokens=2000,
                 temperature=0.1,
+                system=_SYSTEM_PROMPT,
                 messages=[
                     {
                         "role": "user",
-                        "content": self.create_extraction_prompt(text)
+                        "content": text
                     }
                 ]
             )
             
             content = response.content[0].text
-            return json.loads(content)
-            
+            return parse_json_response(content)
+        
         except Exception as e:
             logger.error(f"Error extracting with Anthropic: {e}")
             return None
     
-    def extract_invoice_data(self, text: str, file_path: str) -> Optional[Invoice]:
-        """Extract structured invoice data from text using available AI models"""
+    def _cache_path(self, text: str) -> Path:
+        """Cache file for the AI result of the given text"""
+        key = _CACHE_KEY_SEED.copy()
+        key.update(text.encode("utf-8"))
+        return self.cache_dir / f"{key.hexdigest()}.json"
+    
+    def _load_cached_extraction(self, text: str) -> Optional[dict]:
+        """Return a previously cached AI result for this text, if any"""
+        if not self.cache_dir:
+            return None
         
-        # Try OpenAI first, then Anthropic as fallback
-        extracted_data = None
+        try:
+            return orjson.loads(self._cache_path(text).read_bytes())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable AI cache entry: {e}")
+            return None
+    
+    def _store_cached_extraction(self, text: str, extracted_data: Optional[dict]) -> None:
+        """Persist a successful AI result for later runs"""
+        if not self.cache_dir or not extracted_data:
+            return
         
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._cache_path(text).write_bytes(orjson.dumps(extracted_data))
+        except Exception as e:
+            logger.warning(f"Failed to write AI cache entry: {e}")
+    
+    def _extract_data(self, text: str) -> Optional[dict]:
+        """Extract raw invoice data for one piece of text, trying OpenAI then Anthropic"""
+        extracted_data = self._load_cached_extraction(text)
+        if extracted_data:
+            logger.info("Using cached AI extraction")
+            return extracted_data
+        
+        # Try OpenAI first, then Anthropic as fallback
         if self.openai_client:
             extracted_data = self.extract_with_openai(text)
         
@@ -142,6 +244,21 @@ Invoice text:
             logger.info("Falling back to Anthropic for extraction")
             extracted_data = self.extract_with_anthropic(text)
         
+        self._store_cached_extraction(text, extracted_data)
+        return extracted_data
+    
+    def extract_invoice_data(self, text: str, file_path: str) -> Optional[Invoice]:
+        """Extract structured invoice data from text using available AI models"""
+        if len(text) <= MAX_CHUNK_CHARS:
+            return self._build_invoice(self._extract_data(text), text, file_path)
+        
+        chunks = split_text_into_chunks(text)
+        logger.info(f"Extracting {file_path} in {len(chunks)} chunks")
+        extracted_data = merge_extractions(self._extract_data(chunk) for chunk in chunks)
+        return self._build_invoice(extracted_data, text, file_path)
+    
+    def _build_invoice(self, extracted_data: Optional[dict], text: str, file_path: str) -> Optional[Invoice]:
+        """Parse the extracted AI data into an Invoice model"""
         if not extracted_data:
             logger.error("Failed to extract data with any AI model")
             return None
@@ -151,8 +268,8 @@ Invoice text:
             header_data = extracted_data.get("header", {})
             line_items_data = extracted_data.get("line_items", [])
             
-            header = InvoiceHeader(**header_data)
-            line_items = [InvoiceLineItem(**item) for item in line_items_data]
+            header = _HEADER_ADAPTER.validate_python(header_data)
+            line_items = _LINE_ITEM_ADAPTER.validate_python(line_items_data)
             
             invoice = Invoice(
                 header=header,
@@ -1,44 +1,98 @@
 import logging
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Union
 
 import cv2
 import numpy as np
 import pytesseract
 from PIL import Image
 
+try:
+    # Optional: in-process Tesseract binding that keeps the model loaded between images
+    from tesserocr import OEM, PSM, PyTessBaseAPI
+except ImportError:
+    PyTessBaseAPI = None
+
 logger = logging.getLogger(__name__)
 
+# Large flatbed scans legitimately exceed PIL's default decompression-bomb limit
+Image.MAX_IMAGE_PIXELS = 200_000_000
+
+# Longest side images are reduced to before OCR; plenty for invoice text and far fewer bytes to preprocess
+MAX_OCR_SIDE = 2400
+
+# Tesseract page segmentation modes: a single column of variable-size text suits portrait
+# invoices and receipts; landscape pages tend to have side-by-side blocks that need full layout analysis
+PSM_AUTO = 3
+PSM_SINGLE_COLUMN = 4
+LANDSCAPE_RATIO = 1.2
+
+# LSTM engine only; no character whitelist, which dropped symbols such as # ( ) & % @
+TESSERACT_CONFIGS = {psm: f'--oem 1 --psm {psm}' for psm in (PSM_AUTO, PSM_SINGLE_COLUMN)}
+
+
+def select_psm(image) -> int:
+    """Pick the page segmentation mode from the page's aspect ratio"""
+    if isinstance(image, np.ndarray):
+        height, width = image.shape[:2]
+    elif isinstance(image, Image.Image):
+        width, height = image.size
+    else:
+        return PSM_SINGLE_COLUMN
+    return PSM_AUTO if width > height * LANDSCAPE_RATIO else PSM_SINGLE_COLUMN
+
 
 class ImageExtractor:
     """Extract text from image files using OCR"""
     
     def __init__(self):
-        # Configure Tesseract for better invoice processing
-        self.tesseract_config = '--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.,/:-$€£¥₹ '
+        # Default Tesseract configuration; the PSM is chosen per image in _run_ocr
+        self.tesseract_config = TESSERACT_CONFIGS[PSM_SINGLE_COLUMN]
+        
+        # tesserocr API handle, created on first use; the Tesseract API is not thread-safe
+        self._tess_api = None
+        self._tess_lock = threading.Lock()
     
-    def preprocess_image(self, image: Image.Image) -> Image.Image:
+    def _get_tess_api(self):
+        """Return this extractor's tesserocr API, or None to fall back to pytesseract"""
+        if self._tess_api is None and PyTessBaseAPI is not None:
+            try:
+                self._tess_api = PyTessBaseAPI(psm=PSM.SINGLE_COLUMN, oem=OEM.LSTM_ONLY)
+            except Exception as e:
+                logger.warning(f"Failed to initialize tesserocr, falling back to pytesseract: {e}")
+                self._tess_api = False  # Don't retry for every image
+        return self._tess_api or None
+    
+    def _run_ocr(self, image: Union[np.ndarray, Image.Image]) -> str:
+        """Run Tesseract on a preprocessed image"""
+        psm = select_psm(image)
+        
+        with self._tess_lock:
+            api = self._get_tess_api()
+            if api is not None:
+                if isinstance(image, np.ndarray):
+                    image = Image.fromarray(image)
+                api.SetPageSegMode(psm)
+                api.SetImage(image)
+                return api.GetUTF8Text()
+        
+        return pytesseract.image_to_string(image, config=TESSERACT_CONFIGS[psm])
+    
+    def preprocess_image(self, image: Image.Image) -> Union[np.ndarray, Image.Image]:
         """Preprocess image for better OCR accuracy"""
         try:
-            # Convert PIL to OpenCV format
-            opencv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(opencv_image, cv2.COLOR_BGR2GRAY)
+            # Convert straight to grayscale in PIL; channel order is irrelevant for grayscale
+            gray = np.asarray(image.convert('L'))
             
             # Apply Gaussian blur to reduce noise
             blurred = cv2.GaussianBlur(gray, (5, 5), 0)
             
-            # Apply adaptive thresholding
-            threshold = cv2.adaptiveThreshold(
+            # Apply adaptive thresholding; Tesseract accepts the resulting array directly
+            return cv2.adaptiveThreshold(
                 blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
             )
             
-            # Convert back to PIL Image
-            processed_image = Image.fromarray(threshold)
-            
-            return processed_image
-            
         except Exception as e:
             logger.warning(f"Error preprocessing image: {e}. Using original image.")
             return image
@@ -50,11 +104,11 @@ class ImageExtractor:
             processed_image = self.preprocess_image(image)
             
             # Extract text using Tesseract
-            text = pytesseract.image_to_string(processed_image, config=self.tesseract_config)
+            text = self._run_ocr(processed_image).strip()
             
-            if text.strip():
+            if text:
                 logger.info("Successfully extracted text from image using OCR")
-                return text.strip()
+                return text
             else:
                 logger.warning("No text found in image")
                 return None
@@ -67,6 +121,10 @@ class ImageExtractor:
         """Extract text from image file"""
         try:
             image = Image.open(file_path)
+            
+            # For JPEGs, let the decoder downscale during decode instead of building a full-size buffer
+            image.draft('L', (MAX_OCR_SIDE, MAX_OCR_SIDE))
+            image.thumbnail((MAX_OCR_SIDE, MAX_OCR_SIDE), Image.LANCZOS)
             return self.extract_text_from_image(image)
         except Exception as e:
             logger.error(f"Error opening image file {file_path}: {e}")
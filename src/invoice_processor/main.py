@@ -1,4 +1,5 @@
 import logging
+import multiprocessing
 import os
 from pathlib import Path
 
@@ -8,8 +9,6 @@ from rich.console import Console
 from rich.logging import RichHandler
 from rich.progress import Progress
 
-from invoice_processor.workflows.invoice_workflow import run_invoice_processing
-
 # Load environment variables
 load_dotenv()
 
@@ -23,6 +22,7 @@ logging.basicConfig(
     handlers=[RichHandler(console=console, rich_tracebacks=True)]
 )
 
+
 # Create Typer app
 app = typer.Typer(
     name="invoice-processor",
@@ -47,6 +47,11 @@ def process(
         "data/processed",
         "--processed", "-p",
         help="Directory to move processed files"
+    ),
+    workers: int = typer.Option(
+        os.cpu_count() or 1,
+        "--workers", "-w",
+        help="Number of invoice files to process in parallel"
     )
 ):
     """Process invoices from input directory"""
@@ -77,12 +82,17 @@ def process(
     Path(processed_dir).mkdir(parents=True, exist_ok=True)
     
     try:
+        # Only process needs the workflow and its AI/PDF/OCR imports, so setup and status start fast
+        from invoice_processor.workflows.invoice_workflow import run_invoice_processing
+        
         with Progress() as progress:
             task = progress.add_task("Processing invoices...", total=None)
             
-            result = run_invoice_processing(input_dir, output_dir, processed_dir)
+            def on_progress(completed: int, total: int) -> None:
+                progress.update(task, completed=completed, total=total)
             
-            progress.update(task, completed=100)
+            result = run_invoice_processing(input_dir, output_dir, processed_dir,
+                                            max_workers=workers, on_progress=on_progress)
         
         console.print(f"✅ [bold green]{result}[/bold green]")
         
@@ -167,4 +177,7 @@ def status():
 
 
 if __name__ == "__main__":
+    # Frozen (PyInstaller) builds start each worker process through this script; without this
+    # the workers would re-run the CLI instead of picking up their invoice
+    multiprocessing.freeze_support()
     app()
@@ -1,7 +1,7 @@
 from datetime import date
 from decimal import Decimal
 from typing import List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class InvoiceLineItem(BaseModel):
@@ -40,6 +40,9 @@ class Invoice(BaseModel):
 
 class FlatInvoiceRecord(BaseModel):
     """Flattened invoice record with header repeated for each line item"""
+    # Records are write-once output rows
+    model_config = ConfigDict(frozen=True)
+    
     # Header fields
     invoice_number: Optional[str] = None
     invoice_date: Optional[date] = None
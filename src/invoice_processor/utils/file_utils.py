@@ -1,10 +1,108 @@
+import errno
 import logging
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import Iterator, List, Optional, Set, Tuple
 
 logger = logging.getLogger(__name__)
 
-SUPPORTED_EXTENSIONS = {'.pdf', '.png', '.jpg', '.jpeg', '.tiff', '.bmp'}
+SUPPORTED_EXTENSIONS = frozenset({'.pdf', '.png', '.jpg', '.jpeg', '.tiff', '.bmp'})
+
+# Extensions without the leading dot, matched against the text after a name's last '.'
+_SUPPORTED_EXTENSIONS_NO_DOT = frozenset(extension[1:] for extension in SUPPORTED_EXTENSIONS)
+
+
+def _is_supported_name(name: str) -> bool:
+    """Whether a file name has a supported extension, compared case-insensitively"""
+    dot = name.rfind('.')
+    if dot < 0:
+        return False
+    
+    # Slicing copies only the extension; lower() is paid only by names not already in lower case
+    extension = name[dot + 1:]
+    return extension in _SUPPORTED_EXTENSIONS_NO_DOT or extension.lower() in _SUPPORTED_EXTENSIONS_NO_DOT
+
+
+# Threads walking top-level subdirectories at once; listing is syscall-bound and os.scandir releases the GIL
+WALK_WORKERS = 8
+
+# Fewer top-level subdirectories than this are walked in the calling thread; for a handful of vendor
+# folders, starting a pool costs more than the listings it would overlap
+PARALLEL_WALK_MIN_SUBDIRS = 32
+
+# Destination directories already created by move_processed_file in this process, as plain strings
+_created_dirs: Set[str] = set()
+
+
+def _scan_directory(path: str) -> Tuple[List[str], List[str]]:
+    """List one directory: the supported file paths in it and the subdirectories to descend into
+    
+    DirEntry types come from the directory listing itself, so no stat() is needed per entry.
+    """
+    matches = []
+    subdirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                # Like os.walk, symlinked directories are listed but not descended into
+                if not entry.is_symlink():
+                    subdirs.append(entry.path)
+            elif entry.is_file() and _is_supported_name(entry.name):
+                matches.append(entry.path)
+    return matches, subdirs
+
+
+def _walk_invoice_files(directories: List[str], recursive: bool) -> Iterator[Tuple[str, List[str]]]:
+    """Yield each directory searched together with the supported file paths directly inside it
+    
+    A single walk visits every file exactly once, so no deduplication is needed.
+    """
+    pending = list(directories)
+    while pending:
+        current = pending.pop()
+        try:
+            matches, subdirs = _scan_directory(current)
+        except OSError as e:
+            # Like os.walk, skip directories that cannot be listed instead of failing the whole search
+            logger.warning(f"Skipping unreadable directory {current}: {e}")
+            continue
+        if recursive:
+            pending.extend(subdirs)
+        yield current, matches
+
+
+def _collect_walk(directory: str) -> List[Tuple[str, List[str]]]:
+    """Walk one directory tree to completion, for use in a worker thread"""
+    return list(_walk_invoice_files([directory], recursive=True))
+
+
+def _walk_invoice_files_parallel(directory: Path) -> Iterator[Tuple[str, List[str]]]:
+    """Recursive _walk_invoice_files with each top-level subdirectory walked in its own thread"""
+    root = str(directory)
+    try:
+        matches, subdirs = _scan_directory(root)
+    except OSError as e:
+        logger.warning(f"Skipping unreadable directory {root}: {e}")
+        return
+    yield root, matches
+    
+    if len(subdirs) < PARALLEL_WALK_MIN_SUBDIRS:
+        yield from _walk_invoice_files(subdirs, recursive=True)
+        return
+    
+    with ThreadPoolExecutor(max_workers=min(WALK_WORKERS, len(subdirs))) as executor:
+        for walk in executor.map(_collect_walk, subdirs):
+            yield from walk
+
+
+def iter_invoice_files(directory: Path, recursive: bool = True) -> Iterator[Path]:
+    """Yield supported invoice files as the walk finds them, unsorted, without collecting them first"""
+    root = str(directory)
+    walk = _walk_invoice_files_parallel(directory) if recursive else _walk_invoice_files([root], recursive=False)
+    for _, matches in walk:
+        yield from map(Path, matches)
 
 
 def get_invoice_files(directory: Path, recursive: bool = True) -> List[Path]:
@@ -13,47 +111,22 @@ def get_invoice_files(directory: Path, recursive: bool = True) -> List[Path]:
         logger.error(f"Directory does not exist: {directory}")
         return []
     
-    files = []
+    # Sort files by path for consistent processing order
+    files = sorted(iter_invoice_files(directory, recursive), key=str)
     
     if recursive:
-        # Use rglob for recursive search
-        for pattern in SUPPORTED_EXTENSIONS:
-            pattern_files = list(directory.rglob(f"*{pattern}"))
-            files.extend(pattern_files)
-        
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_files = []
-        for file_path in files:
-            if file_path not in seen:
-                seen.add(file_path)
-                unique_files.append(file_path)
-        files = unique_files
-        
         logger.info(f"Found {len(files)} invoice files recursively in {directory}")
     else:
-        # Original non-recursive behavior
-        for file_path in directory.iterdir():
-            if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS:
-                files.append(file_path)
-        
         logger.info(f"Found {len(files)} invoice files in {directory}")
     
-    # Sort files by path for consistent processing order
-    files.sort(key=str)
-    
     # Log directory breakdown
     if recursive and files:
-        directory_counts = {}
-        for file_path in files:
-            parent_dir = file_path.parent
-            relative_dir = parent_dir.relative_to(directory)
-            dir_name = str(relative_dir) if relative_dir != Path('.') else 'root'
-            directory_counts[dir_name] = directory_counts.get(dir_name, 0) + 1
+        root = str(directory)
+        directory_counts = Counter(os.path.relpath(os.path.dirname(file_path), root) for file_path in files)
         
         logger.info("Files by directory:")
         for dir_name, count in sorted(directory_counts.items()):
-            logger.info(f"  {dir_name}: {count} files")
+            logger.info(f"  {dir_name if dir_name != '.' else 'root'}: {count} files")
     
     return files
 
@@ -63,31 +136,75 @@ def ensure_directory(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
 
 
-def move_processed_file(source: Path, processed_dir: Path, input_base_dir: Path = None) -> Path:
-    """Move processed file to processed directory, preserving subdirectory structure"""
-    ensure_directory(processed_dir)
-    
-    # If we have the base input directory, preserve the relative path structure
+def _ensure_directory_cached(path: Path) -> None:
+    """ensure_directory, skipped for directories this process already created"""
+    key = os.fspath(path)
+    if key not in _created_dirs:
+        ensure_directory(path)
+        _created_dirs.add(key)
+
+
+def _replace(source: Path, destination: Path) -> None:
+    """os.replace, falling back to copy and delete when the paths are on different filesystems"""
+    try:
+        os.replace(source, destination)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # Only cross-filesystem moves need shutil, so it is imported here rather than at module load
+        import shutil
+        shutil.copy2(source, destination)
+        os.unlink(source)
+
+
+def _processed_destination(source: Path, processed_dir: Path, input_base_dir: Optional[Path]) -> Path:
+    """Where a processed file goes, preserving its subdirectory below the input base when known"""
+    # If the source lies below the base input directory, preserve the relative path structure
     if input_base_dir and input_base_dir in source.parents:
-        # Get relative path from input base to source file
-        relative_path = source.relative_to(input_base_dir)
-        destination = processed_dir / relative_path
-        
-        # Ensure the subdirectory exists
+        return processed_dir / source.relative_to(input_base_dir)
+    
+    # Fallback to simple file name in processed root
+    return processed_dir / source.name
+
+
+def _claim_name(destination: Path) -> Path:
+    """Reserve a free destination name by creating it empty, adding a random suffix while it is taken
+    
+    O_EXCL makes checking and taking the name one atomic step, so concurrent moves cannot pick the
+    same name; it also counts a dangling symlink as taken, which os.replace would otherwise overwrite.
+    """
+    candidate = destination
+    while True:
+        try:
+            os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return candidate
+        except FileExistsError:
+            # One random suffix instead of probing name_1, name_2, ...
+            candidate = destination.with_name(f"{destination.stem}_{os.urandom(4).hex()}{destination.suffix}")
+
+
+def _move_to(source: Path, destination: Path) -> Path:
+    """Move a file into an already ensured directory, renaming it if the name is taken"""
+    try:
+        destination = _claim_name(destination)
+    except FileNotFoundError:
+        # The cached directory may have been removed since it was created; recreate and retry once
         ensure_directory(destination.parent)
-    else:
-        # Fallback to simple file name in processed root
-        destination = processed_dir / source.name
+        destination = _claim_name(destination)
     
-    # Handle file name conflicts
-    counter = 1
-    original_destination = destination
-    while destination.exists():
-        stem = original_destination.stem
-        suffix = original_destination.suffix
-        destination = original_destination.parent / f"{stem}_{counter}{suffix}"
-        counter += 1
+    try:
+        _replace(source, destination)
+    except OSError:
+        # Release the reserved name so a failed move leaves no empty file behind
+        os.unlink(destination)
+        raise
     
-    source.rename(destination)
     logger.info(f"Moved processed file: {source} -> {destination}")
     return destination
+
+
+def move_processed_file(source: Path, processed_dir: Path, input_base_dir: Path = None) -> Path:
+    """Move processed file to processed directory, preserving subdirectory structure"""
+    destination = _processed_destination(source, processed_dir, input_base_dir)
+    _ensure_directory_cached(destination.parent)
+    return _move_to(source, destination)
@@ -1,7 +1,10 @@
 import logging
+import os
+from collections import Counter
 from datetime import datetime
+from decimal import Decimal
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Iterator, List, Dict, Any, Optional
 import pandas as pd
 
 from invoice_processor.models.invoice import FlatInvoiceRecord
@@ -9,6 +12,36 @@ from invoice_processor.models.invoice import FlatInvoiceRecord
 logger = logging.getLogger(__name__)
 
 
+# Input folder prefix dropped from file names in the summary table
+_INPUT_PREFIX = "data/input/"
+
+# Above this many invoices the report lists them as CSV rather than an aligned table
+MAX_FORMATTED_TABLE_ROWS = 200
+
+# Products shown per invoice in the summary table; one more is kept to know whether to add "..."
+PRODUCT_PREVIEW_COUNT = 2
+
+# (processing status, extraction quality) per classification tag
+STATUS_OCR_ONLY, STATUS_FAILED, STATUS_AI_EXTRACTED = range(3)
+_STATUS = (("OCR Only", "Poor"), ("Failed", "None"), ("AI Extracted", "Good"))
+
+
+def _classify(record: FlatInvoiceRecord) -> int:
+    """Classify an invoice by its first record into one of the STATUS_* tags"""
+    if record.vendor_name == "Unknown (OCR only)":
+        return STATUS_OCR_ONLY
+    if record.item_description == "No line items found":
+        return STATUS_FAILED
+    return STATUS_AI_EXTRACTED
+
+
+def _display_name(file_path: str) -> str:
+    """Path relative to the input folder for readability, or just the file name"""
+    # One scan for the prefix instead of a containment check followed by a replace
+    head, prefix, tail = file_path.partition(_INPUT_PREFIX)
+    return head + tail if prefix else os.path.basename(file_path)
+
+
 class InvoiceSummaryGenerator:
     """Generate comprehensive summaries and reports from processed invoices"""
     
@@ -16,7 +49,39 @@ class InvoiceSummaryGenerator:
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
     
-    def analyze_processing_results(self, records: List[FlatInvoiceRecord]) -> Dict[str, Any]:
+    def _index_by_file(self, records: List[FlatInvoiceRecord]) -> Dict[str, Dict[str, Any]]:
+        """Group records by file in one pass, keeping what the summaries need per invoice"""
+        file_index = {}
+        for record in records:
+            entry = file_index.get(record.file_path)
+            if entry is None:
+                entry = file_index[record.file_path] = {
+                    "first": record, "tag": _classify(record), "display": _display_name(record.file_path),
+                    "count": 0, "products": [], "total": None, "currency": None
+                }
+            entry["count"] += 1
+            
+            description = record.item_description
+            products = entry["products"]
+            if (len(products) <= PRODUCT_PREVIEW_COUNT and description
+                    and description != "No line items found" and not description.startswith("OCR Text")):
+                products.append(description)
+            
+            # The invoice total comes from the first record with a usable amount
+            if (entry["total"] is None and record.total_amount
+                    and record.vendor_name != "Unknown (OCR only)"
+                    and description != "No line items found"):
+                entry["total"] = record.total_amount
+                entry["currency"] = record.currency
+        
+        return file_index
+    
+    def _count_tags(self, file_index: Dict[str, Dict[str, Any]]) -> Counter:
+        """Count invoices per classification tag"""
+        return Counter(entry["tag"] for entry in file_index.values())
+    
+    def analyze_processing_results(self, records: List[FlatInvoiceRecord],
+                                   file_index: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
         """Analyze processing results and generate statistics"""
         if not records:
             return {
@@ -27,28 +92,15 @@ class InvoiceSummaryGenerator:
                 "success_rate": 0.0
             }
         
-        # Group records by file
-        files_data = {}
-        for record in records:
-            file_path = record.file_path
-            if file_path not in files_data:
-                files_data[file_path] = []
-            files_data[file_path].append(record)
-        
-        total_files = len(files_data)
-        successful_extractions = 0
-        ocr_only = 0
-        failed_extractions = 0
-        
-        for file_path, file_records in files_data.items():
-            first_record = file_records[0]
-            
-            if first_record.vendor_name == "Unknown (OCR only)":
-                ocr_only += 1
-            elif first_record.item_description == "No line items found":
-                failed_extractions += 1
-            else:
-                successful_extractions += 1
+        if file_index is None:
+            file_index = self._index_by_file(records)
+        
+        total_files = len(file_index)
+        tag_counts = self._count_tags(file_index)
+        
+        successful_extractions = tag_counts[STATUS_AI_EXTRACTED]
+        ocr_only = tag_counts[STATUS_OCR_ONLY]
+        failed_extractions = tag_counts[STATUS_FAILED]
         
         success_rate = (successful_extractions / total_files * 100) if total_files > 0 else 0
         
@@ -61,62 +113,36 @@ class InvoiceSummaryGenerator:
             "total_line_items": len(records)
         }
     
-    def generate_invoice_summary_table(self, records: List[FlatInvoiceRecord]) -> pd.DataFrame:
+    def generate_invoice_summary_table(self, records: List[FlatInvoiceRecord],
+                                       file_index: Optional[Dict[str, Dict[str, Any]]] = None) -> pd.DataFrame:
         """Generate a summary table with one row per invoice"""
         if not records:
             return pd.DataFrame()
         
-        # Group records by file to get invoice-level summaries
-        invoice_summaries = []
+        if file_index is None:
+            file_index = self._index_by_file(records)
         
-        files_data = {}
-        for record in records:
-            file_path = record.file_path
-            if file_path not in files_data:
-                files_data[file_path] = []
-            files_data[file_path].append(record)
+        invoice_summaries = []
         
-        for file_path, file_records in files_data.items():
-            first_record = file_records[0]
+        for entry in file_index.values():
+            first_record = entry["first"]
             
-            # Determine processing status
-            if first_record.vendor_name == "Unknown (OCR only)":
-                status = "OCR Only"
-                extraction_quality = "Poor"
-            elif first_record.item_description == "No line items found":
-                status = "Failed"
-                extraction_quality = "None"
-            else:
-                status = "AI Extracted"
-                extraction_quality = "Good"
+            # Processing status was classified once while indexing
+            status, extraction_quality = _STATUS[entry["tag"]]
             
             # Calculate financial summary
             total_amount = first_record.total_amount if first_record.total_amount else 0
-            line_item_count = len(file_records)
-            
-            # Get unique products
-            products = []
-            for record in file_records:
-                if record.item_description and record.item_description not in ["No line items found"]:
-                    if not record.item_description.startswith("OCR Text"):
-                        products.append(record.item_description)
-            
-            # Use relative path for better readability if it's in a subdirectory
-            file_display = str(Path(file_path))
-            if "data/input/" in file_display:
-                file_display = file_display.replace("data/input/", "")
-            else:
-                file_display = Path(file_path).name
+            products = entry["products"]
             
             invoice_summary = {
-                "File": file_display,
+                "File": entry["display"],
                 "Invoice Number": first_record.invoice_number or "N/A",
                 "Date": first_record.invoice_date or "N/A",
                 "Vendor": first_record.vendor_name or "N/A",
                 "Customer": first_record.customer_name or "N/A",
                 "Total Amount": f"{first_record.currency or ''} {total_amount:.2f}" if total_amount else "N/A",
-                "Line Items": line_item_count,
-                "Products": "; ".join(products[:2]) + ("..." if len(products) > 2 else "") if products else "N/A",
+                "Line Items": entry["count"],
+                "Products": "; ".join(products[:PRODUCT_PREVIEW_COUNT]) + ("..." if len(products) > PRODUCT_PREVIEW_COUNT else "") if products else "N/A",
                 "Processing Status": status,
                 "Extraction Quality": extraction_quality
             }
@@ -125,54 +151,54 @@ class InvoiceSummaryGenerator:
         
         return pd.DataFrame(invoice_summaries)
     
-    def generate_financial_summary(self, records: List[FlatInvoiceRecord]) -> Dict[str, Any]:
+    def generate_financial_summary(self, records: List[FlatInvoiceRecord],
+                                   file_index: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
         """Generate financial summary statistics"""
         if not records:
             return {}
         
-        # Filter out failed/OCR-only records for financial analysis
-        valid_records = [
-            r for r in records 
-            if r.total_amount and r.vendor_name != "Unknown (OCR only)" 
-            and r.item_description != "No line items found"
-        ]
-        
-        if not valid_records:
-            return {"message": "No valid financial data extracted"}
+        if file_index is None:
+            file_index = self._index_by_file(records)
         
-        # Group by file to get unique invoices
-        invoice_totals = {}
+        # Only invoices with a usable amount (not failed/OCR-only) count towards the totals
+        invoice_totals = []
         currencies = set()
+        for entry in file_index.values():
+            if entry["total"] is not None:
+                invoice_totals.append(entry["total"])
+                if entry["currency"]:
+                    currencies.add(entry["currency"])
         
-        for record in valid_records:
-            file_path = record.file_path
-            if file_path not in invoice_totals:
-                invoice_totals[file_path] = record.total_amount
-                if record.currency:
-                    currencies.add(record.currency)
+        if not invoice_totals:
+            return {"message": "No valid financial data extracted"}
         
-        totals = list(invoice_totals.values())
+        # Sum the Decimal totals directly, so amounts are exact and nothing is rounded to cents
+        total_value = sum(invoice_totals, Decimal(0))
         
         return {
-            "total_invoices_with_amounts": len(totals),
-            "total_value": sum(totals),
-            "average_invoice_value": sum(totals) / len(totals),
-            "min_invoice": min(totals),
-            "max_invoice": max(totals),
+            "total_invoices_with_amounts": len(invoice_totals),
+            "total_value": total_value,
+            "average_invoice_value": total_value / len(invoice_totals),
+            "min_invoice": min(invoice_totals),
+            "max_invoice": max(invoice_totals),
             "currencies": list(currencies)
         }
     
-    def generate_detailed_summary_report(self, records: List[FlatInvoiceRecord], 
-                                       processing_stats: Dict[str, Any],
-                                       csv_file_path: str) -> str:
-        """Generate a comprehensive text summary report"""
+    def _iter_report_lines(self, records: List[FlatInvoiceRecord],
+                           processing_stats: Dict[str, Any],
+                           csv_file_path: str,
+                           file_index: Optional[Dict[str, Dict[str, Any]]] = None) -> Iterator[str]:
+        """Yield the lines of the text summary report"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
+        if file_index is None:
+            file_index = self._index_by_file(records)
+        
         # Get analysis data
-        summary_table = self.generate_invoice_summary_table(records)
-        financial_summary = self.generate_financial_summary(records)
+        summary_table = self.generate_invoice_summary_table(records, file_index)
+        financial_summary = self.generate_financial_summary(records, file_index)
         
-        report_lines = [
+        yield from [
             "=" * 80,
             "INVOICE PROCESSING SUMMARY REPORT",
             "=" * 80,
@@ -193,7 +219,7 @@ class InvoiceSummaryGenerator:
         # Add financial summary if available
         if "total_value" in financial_summary:
             currencies_str = ", ".join(financial_summary["currencies"]) if financial_summary["currencies"] else "Mixed"
-            report_lines.extend([
+            yield from [
                 "FINANCIAL SUMMARY",
                 "-" * 40,
                 f"Invoices with Valid Amounts: {financial_summary['total_invoices_with_amounts']}",
@@ -202,73 +228,83 @@ class InvoiceSummaryGenerator:
                 f"Smallest Invoice: {financial_summary['min_invoice']:.2f}",
                 f"Largest Invoice: {financial_summary['max_invoice']:.2f}",
                 ""
-            ])
+            ]
         
         # Add detailed invoice table
         if not summary_table.empty:
-            report_lines.extend([
+            yield from [
                 "DETAILED INVOICE SUMMARY",
                 "-" * 40,
                 ""
-            ])
+            ]
             
-            # Convert table to string with proper formatting
-            table_str = summary_table.to_string(index=False, max_cols=None, max_colwidth=30)
-            report_lines.append(table_str)
-            report_lines.append("")
+            # Convert table to string with proper formatting; aligning columns is slow for large
+            # tables, so those are listed as CSV instead
+            if len(summary_table) > MAX_FORMATTED_TABLE_ROWS:
+                yield summary_table.to_csv(index=False)
+            else:
+                yield summary_table.to_string(index=False, max_cols=None, max_colwidth=30)
+            yield ""
         
         # Add processing status breakdown
-        report_lines.extend([
+        yield from [
             "PROCESSING STATUS BREAKDOWN",
             "-" * 40,
             ""
-        ])
+        ]
         
         if not summary_table.empty:
-            status_counts = summary_table["Processing Status"].value_counts()
-            for status, count in status_counts.items():
-                report_lines.append(f"{status}: {count} files")
+            # Status and quality both derive from the tag, so one count serves both breakdowns
+            tag_counts = self._count_tags(file_index).most_common()
+            for tag, count in tag_counts:
+                yield f"{_STATUS[tag][0]}: {count} files"
             
-            report_lines.append("")
+            yield ""
             
-            quality_counts = summary_table["Extraction Quality"].value_counts()
-            report_lines.append("Extraction Quality:")
-            for quality, count in quality_counts.items():
-                report_lines.append(f"  {quality}: {count} files")
+            yield "Extraction Quality:"
+            for tag, count in tag_counts:
+                yield f"  {_STATUS[tag][1]}: {count} files"
         
-        report_lines.extend([
+        yield from [
             "",
             "=" * 80,
             "End of Report",
             "=" * 80
-        ])
-        
-        return "\n".join(report_lines)
+        ]
+    
+    def generate_detailed_summary_report(self, records: List[FlatInvoiceRecord], 
+                                       processing_stats: Dict[str, Any],
+                                       csv_file_path: str,
+                                       file_index: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+        """Generate a comprehensive text summary report"""
+        return "\n".join(self._iter_report_lines(records, processing_stats, csv_file_path, file_index))
     
     def save_summary_report(self, records: List[FlatInvoiceRecord], 
-                          csv_file_path: str) -> str:
-        """Save comprehensive summary report to file"""
+                          csv_file_path: str, timestamp: Optional[str] = None) -> str:
+        """Save comprehensive summary report to file, named with the given run timestamp if any"""
         
-        # Generate analysis
-        processing_stats = self.analyze_processing_results(records)
+        # Group records by file once and share it across all summaries
+        file_index = self._index_by_file(records)
         
-        # Generate detailed report
-        report_content = self.generate_detailed_summary_report(
-            records, processing_stats, csv_file_path
-        )
+        # Generate analysis
+        processing_stats = self.analyze_processing_results(records, file_index)
         
         # Save to file
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if timestamp is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         summary_file = self.output_dir / f"invoice_processing_summary_{timestamp}.txt"
         
+        # Stream the report line by line instead of building the whole text in memory first
+        report_lines = self._iter_report_lines(records, processing_stats, csv_file_path, file_index)
         with open(summary_file, 'w', encoding='utf-8') as f:
-            f.write(report_content)
+            f.write(next(report_lines))
+            f.writelines("\n" + line for line in report_lines)
         
         logger.info(f"Summary report saved to: {summary_file}")
         return str(summary_file)
     
-    def save_summary_table(self, records: List[FlatInvoiceRecord]) -> str:
-        """Save summary table as separate CSV"""
+    def save_summary_table(self, records: List[FlatInvoiceRecord], timestamp: Optional[str] = None) -> str:
+        """Save summary table as separate CSV, named with the given run timestamp if any"""
         
         summary_table = self.generate_invoice_summary_table(records)
         
@@ -276,7 +312,13 @@ class InvoiceSummaryGenerator:
             logger.warning("No data to generate summary table")
             return ""
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Typed columns write faster than object columns and take less memory
+        summary_table["Line Items"] = summary_table["Line Items"].astype("int32")
+        for column in ("Processing Status", "Extraction Quality"):
+            summary_table[column] = summary_table[column].astype("category")
+        
+        if timestamp is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         table_file = self.output_dir / f"invoice_summary_table_{timestamp}.csv"
         
         summary_table.to_csv(table_file, index=False)
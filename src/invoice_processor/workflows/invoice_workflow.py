@@ -1,20 +1,53 @@
+import csv
 import logging
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from datetime import datetime
+from functools import lru_cache
+from operator import attrgetter
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, List, Optional
 
 import pandas as pd
 # Note: Prefect removed for PyInstaller compatibility
 
 from invoice_processor.extractors.ai_extractor import AIExtractor
 from invoice_processor.extractors.image_extractor import ImageExtractor
-from invoice_processor.extractors.pdf_extractor import PDFExtractor
-from invoice_processor.models.invoice import FlatInvoiceRecord, Invoice
+from invoice_processor.extractors.pdf_extractor import PDFExtractor, set_render_threads
+from invoice_processor.models.invoice import FlatInvoiceRecord, Invoice, InvoiceHeader, InvoiceLineItem
 from invoice_processor.utils.file_utils import get_invoice_files, move_processed_file
 from invoice_processor.utils.summary_generator import InvoiceSummaryGenerator
 
 logger = logging.getLogger(__name__)
 
+# AI requests in flight at once when processing in parallel; they are latency-bound, so this can exceed the CPU count
+AI_WORKERS = 8
+
+# Words and symbols found on any invoice; text with none of them is not worth an AI request
+_INVOICE_SIGNAL_RE = re.compile(
+    r"\b(?:invoice|receipt|bill|total|subtotal|amount|vat|tax|due|qty|quantity|price)\b|[€$£]",
+    re.IGNORECASE
+)
+
+# Header and line item fields that flat records repeat
+_HEADER_RECORD_FIELDS = tuple(name for name in InvoiceHeader.model_fields if name in FlatInvoiceRecord.model_fields)
+_LINE_ITEM_RECORD_FIELDS = tuple(name for name in InvoiceLineItem.model_fields if name in FlatInvoiceRecord.model_fields)
+
+# CSV columns, in FlatInvoiceRecord field order
+FLAT_RECORD_FIELDS = tuple(FlatInvoiceRecord.model_fields)
+_get_flat_record_fields = attrgetter(*FLAT_RECORD_FIELDS)
+
+
+@lru_cache(maxsize=None)
+def _get_extractor(extractor_class):
+    """Return a shared extractor instance, created once per process
+    
+    Extractors are shared across threads: PDFExtractor is stateless, ImageExtractor locks
+    its Tesseract handle, and the AI SDK clients are thread-safe.
+    """
+    return extractor_class()
+
 
 def extract_text_from_file(file_path: Path) -> Optional[str]:
     """Extract text from PDF or image file"""
@@ -22,7 +55,7 @@ def extract_text_from_file(file_path: Path) -> Optional[str]:
     
     try:
         if file_extension == '.pdf':
-            pdf_extractor = PDFExtractor()
+            pdf_extractor = _get_extractor(PDFExtractor)
             
             # Try direct text extraction first
             text = pdf_extractor.extract_text(file_path)
@@ -32,18 +65,18 @@ def extract_text_from_file(file_path: Path) -> Optional[str]:
                 images = pdf_extractor.convert_to_images(file_path)
                 
                 if images:
-                    image_extractor = ImageExtractor()
-                    ocr_text = ""
+                    image_extractor = _get_extractor(ImageExtractor)
+                    pages = []
                     for i, image in enumerate(images):
                         page_text = image_extractor.extract_text_from_image(image)
                         if page_text:
-                            ocr_text += f"Page {i+1}:\n{page_text}\n\n"
-                    text = ocr_text if ocr_text.strip() else text
+                            pages.append(f"Page {i+1}:\n{page_text}")
+                    text = "\n\n".join(pages) if pages else text
             
             return text
             
         else:  # Image files
-            image_extractor = ImageExtractor()
+            image_extractor = _get_extractor(ImageExtractor)
             return image_extractor.extract_text_from_file(file_path)
             
     except Exception as e:
@@ -57,8 +90,12 @@ def extract_invoice_structure(text: str, file_path: str) -> Optional[Invoice]:
         logger.warning(f"Insufficient text for AI extraction: {file_path}")
         return None
     
-    ai_extractor = AIExtractor()
-    invoice = ai_extractor.extract_invoice_data(text, file_path)
+    if _INVOICE_SIGNAL_RE.search(text):
+        ai_extractor = _get_extractor(AIExtractor)
+        invoice = ai_extractor.extract_invoice_data(text, file_path)
+    else:
+        logger.info(f"No invoice keywords in text from {file_path}, skipping AI extraction")
+        invoice = None
     
     # If AI extraction fails, create a basic invoice with the raw text
     if not invoice:
@@ -95,95 +132,164 @@ def flatten_invoice_data(invoice: Invoice) -> List[FlatInvoiceRecord]:
     flat_records = []
     processing_timestamp = datetime.now().isoformat()
     
+    # Header and line items are already validated models with the same field types, so records
+    # are built with model_construct instead of paying for a second validation pass per line item.
+    # Only the record's own fields are copied, so nothing else on the source objects can leak in.
+    # Header and metadata fields are the same for every record, so they are read once.
+    header = invoice.header
+    common_fields = {name: getattr(header, name) for name in _HEADER_RECORD_FIELDS}
+    
+    # Metadata
+    common_fields["file_path"] = invoice.file_path
+    common_fields["processing_timestamp"] = processing_timestamp
+    
     # If no line items, create one record with just header info
     if not invoice.line_items:
-        flat_record = FlatInvoiceRecord(
-            # Header fields
-            invoice_number=invoice.header.invoice_number,
-            invoice_date=invoice.header.invoice_date,
-            due_date=invoice.header.due_date,
-            vendor_name=invoice.header.vendor_name,
-            vendor_address=invoice.header.vendor_address,
-            vendor_tax_id=invoice.header.vendor_tax_id,
-            customer_name=invoice.header.customer_name,
-            customer_address=invoice.header.customer_address,
-            total_amount=invoice.header.total_amount,
-            tax_amount=invoice.header.tax_amount,
-            subtotal=invoice.header.subtotal,
-            currency=invoice.header.currency,
+        flat_record = FlatInvoiceRecord.model_construct(
+            **common_fields,
             
             # Empty line item fields
-            item_description="No line items found",
-            quantity=None,
-            unit_price=None,
-            line_total=None,
-            item_code=None,
-            
-            # Metadata
-            file_path=invoice.file_path,
-            processing_timestamp=processing_timestamp
+            item_description="No line items found"
         )
         flat_records.append(flat_record)
     else:
-        # Create one record per line item
+        # Create one record per line item, repeating the header fields
         for line_item in invoice.line_items:
-            flat_record = FlatInvoiceRecord(
-                # Header fields (repeated for each line item)
-                invoice_number=invoice.header.invoice_number,
-                invoice_date=invoice.header.invoice_date,
-                due_date=invoice.header.due_date,
-                vendor_name=invoice.header.vendor_name,
-                vendor_address=invoice.header.vendor_address,
-                vendor_tax_id=invoice.header.vendor_tax_id,
-                customer_name=invoice.header.customer_name,
-                customer_address=invoice.header.customer_address,
-                total_amount=invoice.header.total_amount,
-                tax_amount=invoice.header.tax_amount,
-                subtotal=invoice.header.subtotal,
-                currency=invoice.header.currency,
-                
-                # Line item fields
-                item_description=line_item.item_description,
-                quantity=line_item.quantity,
-                unit_price=line_item.unit_price,
-                line_total=line_item.line_total,
-                item_code=line_item.item_code,
-                
-                # Metadata
-                file_path=invoice.file_path,
-                processing_timestamp=processing_timestamp
-            )
+            line_fields = {name: getattr(line_item, name) for name in _LINE_ITEM_RECORD_FIELDS}
+            flat_record = FlatInvoiceRecord.model_construct(**common_fields, **line_fields)
             flat_records.append(flat_record)
     
     logger.info(f"Created {len(flat_records)} flat records for invoice {invoice.header.invoice_number}")
     return flat_records
 
 
-def save_results_to_csv(all_records: List[FlatInvoiceRecord], output_file: Path) -> str:
+def save_results_to_csv(all_records: List[FlatInvoiceRecord], output_file: Path, use_pandas: bool = False) -> str:
     """Save all flat records to CSV file"""
     if not all_records:
         logger.warning("No records to save")
         return "No records processed"
     
-    # Convert to DataFrame
-    df = pd.DataFrame([record.model_dump() if hasattr(record, 'model_dump') else record.dict() for record in all_records])
-    
     # Ensure output directory exists
     output_file.parent.mkdir(parents=True, exist_ok=True)
     
-    # Save to CSV
-    df.to_csv(output_file, index=False)
+    if use_pandas:
+        # Build the DataFrame column-wise straight from record attributes, without a dict per record
+        columns = zip(*map(_get_flat_record_fields, all_records))
+        df = pd.DataFrame(dict(zip(FLAT_RECORD_FIELDS, columns)), columns=list(FLAT_RECORD_FIELDS))
+        df.to_csv(output_file, index=False)
+    else:
+        # Stream rows straight from the records; no DataFrame is needed just to write a CSV
+        with open(output_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(FLAT_RECORD_FIELDS)
+            writer.writerows(map(_get_flat_record_fields, all_records))
     
     logger.info(f"Saved {len(all_records)} records to {output_file}")
     return f"Successfully saved {len(all_records)} records to {output_file}"
 
 
+def _structure_one(file_path: Path, text: Optional[str], processed_path: Path,
+                   input_path: Path) -> Optional[List[FlatInvoiceRecord]]:
+    """Structure, flatten and move a file whose text was extracted; None if it was skipped"""
+    if not text:
+        logger.warning(f"No text extracted from {file_path}, skipping")
+        return None
+    
+    try:
+        # Extract structured invoice data
+        invoice = extract_invoice_structure(text, str(file_path))
+        
+        if not invoice:
+            logger.warning(f"Failed to extract invoice structure from {file_path}, skipping")
+            return None
+        
+        # Convert to flat records
+        flat_records = flatten_invoice_data(invoice)
+        
+        # Move processed file, preserving directory structure
+        move_processed_file(file_path, processed_path, input_path)
+        return flat_records
+    
+    except Exception as e:
+        logger.error(f"Error processing {file_path}: {e}")
+        return None
+
+
+def _process_one(file_path: Path, processed_path: Path, input_path: Path) -> Optional[List[FlatInvoiceRecord]]:
+    """Extract, flatten and move a single invoice file; None if it was skipped"""
+    logger.info(f"Processing file: {file_path}")
+    
+    try:
+        # Extract text from file
+        text = extract_text_from_file(file_path)
+    except Exception as e:
+        logger.error(f"Error processing {file_path}: {e}")
+        return None
+    
+    return _structure_one(file_path, text, processed_path, input_path)
+
+
+def _process_in_pool(invoice_files: List[Path], processed_path: Path, input_path: Path,
+                     max_workers: int, on_progress: Optional[Callable[[int, int], None]]) -> list:
+    """Process files in parallel, returning results in input order
+    
+    Text extraction (PDF parsing/OCR, CPU-bound) runs in worker processes; as each file's text
+    arrives, its AI extraction, flattening and move (latency-bound) run in a thread pool, so
+    waiting on the AI overlaps with OCR of the remaining files.
+    """
+    results = [None] * len(invoice_files)
+    completed = 0
+    
+    # Each worker renders with its share of the cores, so scanned PDFs don't start cpu_count² pdftoppm processes
+    render_threads = max(1, (os.cpu_count() or 1) // max_workers)
+    
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=set_render_threads,
+                             initargs=(render_threads,)) as text_pool, \
+         ThreadPoolExecutor(max_workers=AI_WORKERS) as ai_pool:
+        text_futures = {}
+        for index, file_path in enumerate(invoice_files):
+            logger.info(f"Processing file: {file_path}")
+            text_futures[text_pool.submit(extract_text_from_file, file_path)] = index
+        structure_futures = {}
+        
+        pending = set(text_futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in text_futures:
+                    index = text_futures[future]
+                    try:
+                        text = future.result()
+                    except Exception as e:
+                        logger.error(f"Error processing {invoice_files[index]}: {e}")
+                        text = None
+                    structure_future = ai_pool.submit(
+                        _structure_one, invoice_files[index], text, processed_path, input_path
+                    )
+                    structure_futures[structure_future] = index
+                    pending.add(structure_future)
+                else:
+                    index = structure_futures[future]
+                    results[index] = future.result()
+                    completed += 1
+                    if on_progress:
+                        on_progress(completed, len(invoice_files))
+    
+    return results
+
+
 def process_invoices(
     input_dir: str = "data/input",
     output_dir: str = "data/output", 
-    processed_dir: str = "data/processed"
+    processed_dir: str = "data/processed",
+    max_workers: int = 1,
+    on_progress: Optional[Callable[[int, int], None]] = None
 ) -> str:
-    """Main workflow to process all invoices in input directory"""
+    """Main workflow to process all invoices in input directory
+    
+    With max_workers > 1, files are processed in parallel worker processes.
+    on_progress is called with (completed, total) after each file.
+    """
     
     input_path = Path(input_dir)
     output_path = Path(output_dir)
@@ -197,49 +303,33 @@ def process_invoices(
     
     logger.info(f"Starting processing of {len(invoice_files)} invoice files")
     
+    if max_workers > 1 and len(invoice_files) > 1:
+        results = _process_in_pool(invoice_files, processed_path, input_path, max_workers, on_progress)
+    else:
+        results = []
+        for completed, file_path in enumerate(invoice_files, start=1):
+            results.append(_process_one(file_path, processed_path, input_path))
+            if on_progress:
+                on_progress(completed, len(invoice_files))
+    
     all_flat_records = []
     processed_count = 0
-    
-    for file_path in invoice_files:
-        logger.info(f"Processing file: {file_path}")
-        
-        try:
-            # Extract text from file
-            text = extract_text_from_file(file_path)
-            
-            if not text:
-                logger.warning(f"No text extracted from {file_path}, skipping")
-                continue
-            
-            # Extract structured invoice data
-            invoice = extract_invoice_structure(text, str(file_path))
-            
-            if not invoice:
-                logger.warning(f"Failed to extract invoice structure from {file_path}, skipping")
-                continue
-            
-            # Convert to flat records
-            flat_records = flatten_invoice_data(invoice)
+    for flat_records in results:
+        if flat_records is not None:
             all_flat_records.extend(flat_records)
-            
-            # Move processed file, preserving directory structure
-            move_processed_file(file_path, processed_path, input_path)
             processed_count += 1
-            
-        except Exception as e:
-            logger.error(f"Error processing {file_path}: {e}")
-            continue
     
     # Save all results to CSV
     if all_flat_records:
+        # One timestamp for the run keeps the CSV, report and table names matching
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_file = output_path / f"processed_invoices_{timestamp}.csv"
         save_results_to_csv(all_flat_records, output_file)
         
         # Generate summary reports
         summary_generator = InvoiceSummaryGenerator(str(output_path))
-        summary_file = summary_generator.save_summary_report(all_flat_records, str(output_file))
-        table_file = summary_generator.save_summary_table(all_flat_records)
+        summary_file = summary_generator.save_summary_report(all_flat_records, str(output_file), timestamp)
+        table_file = summary_generator.save_summary_table(all_flat_records, timestamp)
         
         logger.info(f"Generated summary report: {summary_file}")
         logger.info(f"Generated summary table: {table_file}")
@@ -252,6 +342,8 @@ def process_invoices(
 # Convenience function for running the workflow
 def run_invoice_processing(input_dir: str = "data/input", 
                          output_dir: str = "data/output",
-                         processed_dir: str = "data/processed") -> str:
+                         processed_dir: str = "data/processed",
+                         max_workers: int = 1,
+                         on_progress: Optional[Callable[[int, int], None]] = None) -> str:
     """Run the invoice processing workflow"""
-    return process_invoices(input_dir, output_dir, processed_dir)
+    return process_invoices(input_dir, output_dir, processed_dir, max_workers, on_progress)
@@ -8,10 +8,25 @@ from pathlib import Path
 from datetime import datetime
 from PIL import Image
 import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import openai
+from anthropic import Anthropic
 
 from invoice_processor.models.invoice import (
     Invoice, InvoiceHeader, InvoiceLineItem, FlatInvoiceRecord
 )
+from invoice_processor.extractors.ai_extractor import AIExtractor
+from invoice_processor.workflows import invoice_workflow
+
+
+@pytest.fixture(autouse=True)
+def fresh_extractors():
+    """Drop the workflow's shared extractors around each test, so each sees its own env vars and mocks"""
+    invoice_workflow._get_extractor.cache_clear()
+    yield
+    invoice_workflow._get_extractor.cache_clear()
 
 
 @pytest.fixture
@@ -21,55 +36,63 @@ def temp_dir():
         yield Path(tmp_dir)
 
 
+# Sample models are validated once at import; fixtures hand out shallow copies
+_SAMPLE_INVOICE_HEADER = InvoiceHeader(
+    invoice_number="INV-001",
+    invoice_date=datetime(2024, 1, 15).date(),
+    due_date=datetime(2024, 2, 15).date(),
+    vendor_name="Test Vendor Ltd",
+    vendor_address="123 Test Street, Test City",
+    vendor_tax_id="VAT123456",
+    customer_name="Test Customer Inc",
+    customer_address="456 Customer Ave, Customer City",
+    total_amount=1000.00,
+    tax_amount=200.00,
+    subtotal=800.00,
+    currency="EUR"
+)
+
+_SAMPLE_LINE_ITEMS = [
+    InvoiceLineItem(
+        item_description="Product A",
+        quantity=2,
+        unit_price=200.00,
+        line_total=400.00,
+        item_code="PA001"
+    ),
+    InvoiceLineItem(
+        item_description="Product B",
+        quantity=1,
+        unit_price=400.00,
+        line_total=400.00,
+        item_code="PB001"
+    )
+]
+
+_SAMPLE_INVOICE = Invoice(
+    header=_SAMPLE_INVOICE_HEADER,
+    line_items=_SAMPLE_LINE_ITEMS,
+    raw_text="Sample invoice text content",
+    file_path="test_invoice.pdf"
+)
+
+
 @pytest.fixture
 def sample_invoice_header():
     """Sample invoice header for testing"""
-    return InvoiceHeader(
-        invoice_number="INV-001",
-        invoice_date=datetime(2024, 1, 15).date(),
-        due_date=datetime(2024, 2, 15).date(),
-        vendor_name="Test Vendor Ltd",
-        vendor_address="123 Test Street, Test City",
-        vendor_tax_id="VAT123456",
-        customer_name="Test Customer Inc",
-        customer_address="456 Customer Ave, Customer City",
-        total_amount=1000.00,
-        tax_amount=200.00,
-        subtotal=800.00,
-        currency="EUR"
-    )
+    return _SAMPLE_INVOICE_HEADER.model_copy()
 
 
 @pytest.fixture
 def sample_line_items():
     """Sample line items for testing"""
-    return [
-        InvoiceLineItem(
-            item_description="Product A",
-            quantity=2,
-            unit_price=200.00,
-            line_total=400.00,
-            item_code="PA001"
-        ),
-        InvoiceLineItem(
-            item_description="Product B",
-            quantity=1,
-            unit_price=400.00,
-            line_total=400.00,
-            item_code="PB001"
-        )
-    ]
+    return [item.model_copy() for item in _SAMPLE_LINE_ITEMS]
 
 
 @pytest.fixture
-def sample_invoice(sample_invoice_header, sample_line_items):
+def sample_invoice():
     """Complete sample invoice for testing"""
-    return Invoice(
-        header=sample_invoice_header,
-        line_items=sample_line_items,
-        raw_text="Sample invoice text content",
-        file_path="test_invoice.pdf"
-    )
+    return _SAMPLE_INVOICE.model_copy()
 
 
 @pytest.fixture
@@ -128,10 +151,10 @@ startxref
     return pdf_path
 
 
-@pytest.fixture
-def sample_image_file(temp_dir):
-    """Create a sample image file for testing"""
-    image_path = temp_dir / "sample.png"
+@pytest.fixture(scope="session")
+def sample_image_file(tmp_path_factory):
+    """Create a sample image file for testing, once per run; tests only read it"""
+    image_path = tmp_path_factory.mktemp("images") / "sample.png"
     # Create a simple test image
     img = Image.new('RGB', (100, 50), color='white')
     img.save(image_path)
@@ -161,48 +184,92 @@ def input_directory_structure(temp_dir):
     return input_dir
 
 
+# AI responses are plain dicts that tests only read, so one instance of each is shared
+_MOCK_OPENAI_RESPONSE = {
+    "header": {
+        "invoice_number": "AI-001",
+        "invoice_date": "2024-01-15",
+        "vendor_name": "AI Vendor",
+        "total_amount": 500.00,
+        "currency": "USD"
+    },
+    "line_items": [
+        {
+            "item_description": "AI Product",
+            "quantity": 1,
+            "unit_price": 500.00,
+            "line_total": 500.00
+        }
+    ]
+}
+
+_MOCK_ANTHROPIC_RESPONSE = {
+    "header": {
+        "invoice_number": "ANT-001",
+        "invoice_date": "2024-01-15",
+        "vendor_name": "Anthropic Vendor",
+        "total_amount": 750.00,
+        "currency": "EUR"
+    },
+    "line_items": [
+        {
+            "item_description": "Anthropic Product",
+            "quantity": 2,
+            "unit_price": 375.00,
+            "line_total": 750.00
+        }
+    ]
+}
+
+
 @pytest.fixture
 def mock_openai_response():
     """Mock OpenAI API response"""
-    return {
-        "header": {
-            "invoice_number": "AI-001",
-            "invoice_date": "2024-01-15",
-            "vendor_name": "AI Vendor",
-            "total_amount": 500.00,
-            "currency": "USD"
-        },
-        "line_items": [
-            {
-                "item_description": "AI Product",
-                "quantity": 1,
-                "unit_price": 500.00,
-                "line_total": 500.00
-            }
-        ]
-    }
+    return _MOCK_OPENAI_RESPONSE
 
 
 @pytest.fixture
 def mock_anthropic_response():
     """Mock Anthropic API response"""
-    return {
-        "header": {
-            "invoice_number": "ANT-001",
-            "invoice_date": "2024-01-15",
-            "vendor_name": "Anthropic Vendor",
-            "total_amount": 750.00,
-            "currency": "EUR"
-        },
-        "line_items": [
-            {
-                "item_description": "Anthropic Product",
-                "quantity": 2,
-                "unit_price": 375.00,
-                "line_total": 750.00
-            }
-        ]
-    }
+    return _MOCK_ANTHROPIC_RESPONSE
+
+
+@pytest.fixture(scope="session")
+def mock_openai_response_json():
+    """Mock OpenAI API response as JSON text, serialized once per session"""
+    return json.dumps(_MOCK_OPENAI_RESPONSE)
+
+
+@pytest.fixture(scope="session")
+def mock_anthropic_response_json():
+    """Mock Anthropic API response as JSON text, serialized once per session"""
+    return json.dumps(_MOCK_ANTHROPIC_RESPONSE)
+
+
+def _response_factory(build):
+    """Memoize SDK-shaped responses per payload; the payload is kept with its response so its id is never reused"""
+    cache = {}
+    
+    def make(payload):
+        key = id(payload)
+        if key not in cache:
+            cache[key] = (payload, build(json.dumps(payload)))
+        return cache[key][1]
+    return make
+
+
+@pytest.fixture(scope="session")
+def openai_response_factory():
+    """Build (once per payload) a response shaped like an OpenAI chat completion"""
+    return _response_factory(lambda text: SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text))]
+    ))
+
+
+@pytest.fixture(scope="session")
+def anthropic_response_factory():
+    """Build (once per payload) a response shaped like an Anthropic message"""
+    return _response_factory(lambda text: SimpleNamespace(content=[SimpleNamespace(text=text)]))
 
 
 @pytest.fixture
@@ -239,6 +306,56 @@ def sample_flat_records():
     ]
 
 
+# Client attribute names, read once; mocked clients are spec'd with them so misspelt attributes fail
+_OPENAI_CLIENT_SPEC = dir(openai.OpenAI)
+_ANTHROPIC_CLIENT_SPEC = dir(Anthropic)
+
+
+@pytest.fixture
+def mock_openai(monkeypatch):
+    """Replace the OpenAI client class used by the AI extractor with a fresh MagicMock"""
+    mock_class = MagicMock(return_value=MagicMock(spec_set=_OPENAI_CLIENT_SPEC))
+    monkeypatch.setattr('invoice_processor.extractors.ai_extractor.openai.OpenAI', mock_class)
+    return mock_class
+
+
+@pytest.fixture
+def mock_anthropic(monkeypatch):
+    """Replace the Anthropic client class used by the AI extractor with a fresh MagicMock"""
+    mock_class = MagicMock(return_value=MagicMock(spec_set=_ANTHROPIC_CLIENT_SPEC))
+    monkeypatch.setattr('invoice_processor.extractors.ai_extractor.Anthropic', mock_class)
+    return mock_class
+
+
+@pytest.fixture
+def mock_tesseract(monkeypatch):
+    """Replace pytesseract.image_to_string, as used by the image extractor, with a fresh MagicMock"""
+    mock_func = MagicMock()
+    monkeypatch.setattr('invoice_processor.extractors.image_extractor.pytesseract.image_to_string', mock_func)
+    return mock_func
+
+
+@pytest.fixture
+def mock_tesserocr(monkeypatch):
+    """Make the optional tesserocr names available to the image extractor; returns the PyTessBaseAPI mock"""
+    mock_api_cls = MagicMock()
+    monkeypatch.setattr('invoice_processor.extractors.image_extractor.PyTessBaseAPI', mock_api_cls, raising=False)
+    monkeypatch.setattr('invoice_processor.extractors.image_extractor.PSM', MagicMock(), raising=False)
+    monkeypatch.setattr('invoice_processor.extractors.image_extractor.OEM', MagicMock(), raising=False)
+    return mock_api_cls
+
+
+@pytest.fixture(scope="module")
+def ai_extractor():
+    """One AIExtractor on mock clients, shared by a module's tests that only read from it"""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.delenv("AI_CACHE_DIR", raising=False)
+        return AIExtractor(
+            openai_client=MagicMock(spec_set=_OPENAI_CLIENT_SPEC),
+            anthropic_client=MagicMock(spec_set=_ANTHROPIC_CLIENT_SPEC)
+        )
+
+
 @pytest.fixture
 def mock_env_vars(monkeypatch):
     """Mock environment variables for testing"""
@@ -46,5 +46,5 @@ Feature: File Discovery and Organization
   Scenario: Handle file name conflicts during move
     Given a file with the same name already exists in processed directory
     When I try to move a newly processed file
-    Then the file should be renamed with a counter suffix
+    Then the file should be renamed with a random hex suffix
     And both files should exist in the processed directory
\ No newline at end of file
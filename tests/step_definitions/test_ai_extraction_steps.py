@@ -3,22 +3,73 @@ Step definitions for AI extraction feature tests
 """
 import pytest
 import json
-from unittest.mock import Mock, patch
+from decimal import Decimal
+from types import SimpleNamespace as NS
 from pytest_bdd import scenarios, given, when, then, parsers
 
-from invoice_processor.extractors.ai_extractor import AIExtractor
+from invoice_processor.extractors.ai_extractor import AIExtractor, parse_json_response
 from invoice_processor.models.invoice import Invoice
 
 # Load scenarios from feature file
 scenarios('../features/ai_extraction.feature')
 
 
-@pytest.fixture
+def _raising(message):
+    """Client method stand-in that always raises an error with the given message"""
+    def create(**request):
+        raise Exception(message)
+    return create
+
+
+# Failing client behaviours, built once and shared by every scenario
+_QUOTA_EXCEEDED = _raising("API quota exceeded")
+_OPENAI_UNAVAILABLE = _raising("OpenAI unavailable")
+_ANTHROPIC_UNAVAILABLE = _raising("Anthropic unavailable")
+
+
+class _FakeOpenAI:
+    """Stand-in for openai.OpenAI; the completion behaviour is set per scenario"""
+    respond = None
+    
+    def __init__(self):
+        self.chat = NS(completions=self)
+    
+    def create(self, **request):
+        return _FakeOpenAI.respond(**request)
+
+
+class _FakeAnthropic:
+    """Stand-in for anthropic.Anthropic; the message behaviour is set per scenario"""
+    respond = None
+    
+    def __init__(self):
+        self.messages = self
+    
+    def create(self, **request):
+        return _FakeAnthropic.respond(**request)
+
+
+@pytest.fixture(scope="session")
+def ai_extractor_instance():
+    """One AIExtractor on the fake clients, shared by every scenario"""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.delenv("AI_CACHE_DIR", raising=False)
+        return AIExtractor(openai_client=_FakeOpenAI(), anthropic_client=_FakeAnthropic())
+
+
+@pytest.fixture(scope="module")
 def context():
-    """Test context to store state between steps"""
+    """Test context to store state between steps, one dict for all of the module's scenarios"""
     return {}
 
 
+@pytest.fixture(autouse=True)
+def _reset_context(context):
+    """Clear per-scenario state before each scenario; keys starting with '_' are kept across scenarios"""
+    for key in [key for key in context if not key.startswith('_')]:
+        del context[key]
+
+
 @given('AI services are configured and available')
 def ai_services_configured(context, mock_env_vars):
     """Set up AI service configuration"""
@@ -60,12 +111,14 @@ def both_apis_unavailable(context):
 def valid_ai_response(context, mock_openai_response):
     """Provide valid AI response"""
     context['ai_response'] = mock_openai_response
+    context['ai_response_is_str'] = False
 
 
 @given('I have a malformed AI JSON response')
 def malformed_ai_response(context):
     """Provide malformed AI response"""
     context['ai_response'] = '{"invalid": json syntax}'
+    context['ai_response_is_str'] = True
 
 
 @given('I have extracted invoice data')
@@ -81,70 +134,48 @@ def api_quota_exceeded(context):
 
 
 @when('I extract invoice data using AI')
-def extract_with_ai(context):
+def extract_with_ai(context, ai_extractor_instance):
     """Extract invoice data using AI extractor"""
-    with patch('invoice_processor.extractors.ai_extractor.openai.OpenAI') as mock_openai, \
-         patch('invoice_processor.extractors.ai_extractor.Anthropic') as mock_anthropic:
-        
-        # Configure mocks based on context
-        if context.get('openai_available', True):
-            if context.get('quota_exceeded', False):
-                mock_response = Mock()
-                mock_choice = Mock()
-                mock_message = Mock()
-                mock_message.content = ""
-                mock_choice.message = mock_message
-                mock_response.choices = [mock_choice]
-                mock_openai.return_value.chat.completions.create.side_effect = Exception("API quota exceeded")
-            else:
-                mock_response = Mock()
-                mock_choice = Mock()
-                mock_message = Mock()
-                mock_message.content = json.dumps(context.get('ai_response', {}))
-                mock_choice.message = mock_message
-                mock_response.choices = [mock_choice]
-                mock_openai.return_value.chat.completions.create.return_value = mock_response
-        else:
-            mock_openai.return_value.chat.completions.create.side_effect = Exception("OpenAI unavailable")
-        
-        if context.get('anthropic_available', True):
-            mock_anthropic_response = Mock()
-            mock_content = Mock()
-            mock_content.text = json.dumps(context.get('ai_response', {}))
-            mock_anthropic_response.content = [mock_content]
-            mock_anthropic.return_value.messages.create.return_value = mock_anthropic_response
+    # Configure fake clients based on context; responses are plain namespaces shaped like the SDK's
+    response_json = json.dumps(context.get('ai_response', {}))
+    
+    if context.get('openai_available', True):
+        if context.get('quota_exceeded', False):
+            _FakeOpenAI.respond = _QUOTA_EXCEEDED
         else:
-            mock_anthropic.return_value.messages.create.side_effect = Exception("Anthropic unavailable")
-        
-        # Create extractor and extract
-        extractor = AIExtractor()
-        result = extractor.extract_invoice_data(context['invoice_text'], "test_file.pdf")
-        context['extraction_result'] = result
-        context['extractor'] = extractor
+            openai_response = NS(choices=[NS(message=NS(content=response_json))])
+            _FakeOpenAI.respond = lambda **request: openai_response
+    else:
+        _FakeOpenAI.respond = _OPENAI_UNAVAILABLE
+    
+    if context.get('anthropic_available', True):
+        anthropic_response = NS(content=[NS(text=response_json)])
+        _FakeAnthropic.respond = lambda **request: anthropic_response
+    else:
+        _FakeAnthropic.respond = _ANTHROPIC_UNAVAILABLE
+    
+    # The shared extractor already holds fake clients, which pick up the behaviour set above
+    result = ai_extractor_instance.extract_invoice_data(context['invoice_text'], "test_file.pdf")
+    context['extraction_result'] = result
+    context['extractor'] = ai_extractor_instance
 
 
 @when('I parse the response into invoice models')
 def parse_ai_response(context):
     """Parse AI response into models"""
     try:
-        from invoice_processor.models.invoice import Invoice, InvoiceHeader, InvoiceLineItem
-        
+        # The given steps record whether the response is raw JSON text or an already-parsed dict
         response_data = context['ai_response']
-        if isinstance(response_data, str):
-            response_data = json.loads(response_data)
-        
-        header_data = response_data.get('header', {})
-        line_items_data = response_data.get('line_items', [])
-        
-        header = InvoiceHeader(**header_data)
-        line_items = [InvoiceLineItem(**item) for item in line_items_data]
+        if context.get('ai_response_is_str', False):
+            response_data = parse_json_response(response_data)
         
-        invoice = Invoice(
-            header=header,
-            line_items=line_items,
-            raw_text=context.get('invoice_text', ''),
-            file_path="test_file.pdf"
-        )
+        # Validate header and line items in a single pass over the whole invoice
+        invoice = Invoice.model_validate({
+            "header": response_data.get('header', {}),
+            "line_items": response_data.get('line_items', []),
+            "raw_text": context.get('invoice_text', ''),
+            "file_path": "test_file.pdf"
+        })
         
         context['parsed_invoice'] = invoice
         context['parse_success'] = True
@@ -164,31 +195,24 @@ def try_parse_response(context):
 def validate_invoice_data(context):
     """Validate extracted invoice data"""
     invoice = context['extracted_invoice']
-    validation_results = {}
-    
-    # Check required fields
-    validation_results['has_invoice_number'] = bool(invoice.header.invoice_number)
-    validation_results['has_vendor_name'] = bool(invoice.header.vendor_name)
-    
-    # Check numeric values
-    validation_results['valid_total'] = (
-        invoice.header.total_amount is None or 
-        isinstance(invoice.header.total_amount, (int, float))
-    )
-    
-    # Check dates
-    validation_results['valid_date'] = True  # Pydantic handles date validation
+    fields = invoice.header.model_fields_set
     
-    # Check line items
-    validation_results['has_line_items'] = len(invoice.line_items) > 0
+    # Presence comes from the fields Pydantic recorded as set; amounts are coerced to Decimal by the model
+    validation_results = {
+        'has_invoice_number': 'invoice_number' in fields,
+        'has_vendor_name': 'vendor_name' in fields,
+        'valid_total': invoice.header.total_amount is None or type(invoice.header.total_amount) in (int, float, Decimal),
+        'valid_date': True,  # Pydantic handles date validation
+        'has_line_items': bool(invoice.line_items)
+    }
     
     context['validation_results'] = validation_results
 
 
 @when('I try to extract data using AI')
-def try_extract_with_ai(context):
+def try_extract_with_ai(context, ai_extractor_instance):
     """Try to extract with quota exceeded"""
-    extract_with_ai(context)
+    extract_with_ai(context, ai_extractor_instance)
 
 
 @then('OpenAI should be tried first')
@@ -1,7 +1,10 @@
 """
 Step definitions for file discovery feature tests
 """
+import os
+import re
 import pytest
+from collections import defaultdict
 from pytest_bdd import scenarios, given, when, then, parsers
 from pathlib import Path
 
@@ -11,6 +14,20 @@ from invoice_processor.utils.file_utils import get_invoice_files, move_processed
 scenarios('../features/file_discovery.feature')
 
 
+def _files_by_type(context):
+    """Index the input directory's file paths by (directory, extension), walking it once per scenario
+    
+    Keys and paths are plain strings; building a Path per file is not needed just to filter them.
+    """
+    if 'file_index' not in context:
+        index = defaultdict(list)
+        for root, _, names in os.walk(context['input_dir']):
+            for name in names:
+                index[(root, os.path.splitext(name)[1].lower())].append(os.path.join(root, name))
+        context['file_index'] = index
+    return context['file_index']
+
+
 @pytest.fixture
 def context():
     """Test context to store state between steps"""
@@ -40,7 +57,7 @@ def files_in_subdirectories(context, input_directory_structure):
 def vendor_a_files(context, count):
     """Verify vendor_a has expected number of files"""
     vendor_a_path = context['input_dir'] / 'vendor_a'
-    pdf_files = list(vendor_a_path.glob('*.pdf'))
+    pdf_files = _files_by_type(context)[(str(vendor_a_path), '.pdf')]
     assert len(pdf_files) == count
     context['vendor_a_files'] = pdf_files
 
@@ -49,7 +66,7 @@ def vendor_a_files(context, count):
 def vendor_b_files(context, count):
     """Verify vendor_b has expected number of files"""
     vendor_b_path = context['input_dir'] / 'vendor_b'
-    pdf_files = list(vendor_b_path.glob('*.pdf'))
+    pdf_files = _files_by_type(context)[(str(vendor_b_path), '.pdf')]
     assert len(pdf_files) == count
     context['vendor_b_files'] = pdf_files
 
@@ -68,11 +85,9 @@ def mixed_file_types(context, temp_dir):
     input_dir = temp_dir / 'mixed_input'
     input_dir.mkdir()
     
-    # Create different file types
-    (input_dir / 'invoice1.pdf').write_text('PDF content')
-    (input_dir / 'invoice2.png').write_text('PNG content')
-    (input_dir / 'readme.txt').write_text('TXT content')
-    (input_dir / 'data.xlsx').write_text('Excel content')
+    # Create different file types; only their names matter, so they stay empty
+    for name in ('invoice1.pdf', 'invoice2.png', 'readme.txt', 'data.xlsx'):
+        (input_dir / name).touch()
     
     context['input_dir'] = input_dir
 
@@ -80,7 +95,7 @@ def mixed_file_types(context, temp_dir):
 @given('there are PDF files')
 def pdf_files_exist(context):
     """Verify PDF files exist"""
-    pdf_files = list(context['input_dir'].glob('*.pdf'))
+    pdf_files = _files_by_type(context)[(str(context['input_dir']), '.pdf')]
     assert len(pdf_files) > 0
     context['pdf_files'] = pdf_files
 
@@ -88,7 +103,7 @@ def pdf_files_exist(context):
 @given('there are PNG files')
 def png_files_exist(context):
     """Verify PNG files exist"""
-    png_files = list(context['input_dir'].glob('*.png'))
+    png_files = _files_by_type(context)[(str(context['input_dir']), '.png')]
     assert len(png_files) > 0
     context['png_files'] = png_files
 
@@ -96,7 +111,7 @@ def png_files_exist(context):
 @given('there are TXT files')
 def txt_files_exist(context):
     """Verify TXT files exist"""
-    txt_files = list(context['input_dir'].glob('*.txt'))
+    txt_files = _files_by_type(context)[(str(context['input_dir']), '.txt')]
     assert len(txt_files) > 0
     context['txt_files'] = txt_files
 
@@ -107,15 +122,13 @@ def processed_files_setup(context, temp_dir):
     input_dir = temp_dir / 'input'
     processed_dir = temp_dir / 'processed'
     
-    input_dir.mkdir()
-    processed_dir.mkdir()
-    
-    # Create nested structure
+    # Create nested structure; makedirs creates the input directory along the way
     vendor_dir = input_dir / 'vendor_x'
-    vendor_dir.mkdir()
+    os.makedirs(vendor_dir, exist_ok=True)
+    os.makedirs(processed_dir, exist_ok=True)
     
     test_file = vendor_dir / 'test_invoice.pdf'
-    test_file.write_text('Test invoice content')
+    test_file.touch()
     
     context['input_dir'] = input_dir
     context['processed_dir'] = processed_dir
@@ -126,15 +139,14 @@ def processed_files_setup(context, temp_dir):
 def existing_file_conflict(context, temp_dir):
     """Create file conflict scenario"""
     processed_dir = temp_dir / 'processed'
-    processed_dir.mkdir()
     
-    # Create vendor subdirectory in processed
+    # Create vendor subdirectory in processed, along with the processed directory itself
     vendor_processed = processed_dir / 'vendor_x'
-    vendor_processed.mkdir()
+    os.makedirs(vendor_processed, exist_ok=True)
     
     # Create existing file
     existing_file = vendor_processed / 'test_invoice.pdf'
-    existing_file.write_text('Existing file content')
+    existing_file.touch()
     
     context['processed_dir'] = processed_dir
     context['existing_file'] = existing_file
@@ -177,6 +189,8 @@ def move_file_with_conflict(context):
     """Try to move file that will conflict"""
     # Create a new file to move
     input_file = context['input_dir'] / 'vendor_x' / 'test_invoice.pdf'
+    input_file.parent.mkdir(parents=True, exist_ok=True)
+    input_file.touch()
     
     moved_file = move_processed_file(
         input_file,
@@ -232,16 +246,15 @@ def verify_no_error(context):
 @then('I should only find PDF and PNG files')
 def verify_pdf_png_only(context):
     """Verify only supported file types are found"""
-    found_extensions = {f.suffix.lower() for f in context['found_files']}
     expected_extensions = {'.pdf', '.png'}
-    assert found_extensions.issubset(expected_extensions)
+    # Stops at the first unexpected file instead of collecting every extension first
+    assert not any(f.suffix.lower() not in expected_extensions for f in context['found_files'])
 
 
 @then('TXT files should be ignored')
 def verify_txt_ignored(context):
     """Verify TXT files are not included"""
-    txt_files = [f for f in context['found_files'] if f.suffix.lower() == '.txt']
-    assert len(txt_files) == 0
+    assert not any(f.name.lower().endswith('.txt') for f in context['found_files'])
 
 
 @then('the original directory structure should be preserved')
@@ -260,12 +273,12 @@ def verify_vendor_subdirectories(context):
     assert moved_file.parent.parent == context['processed_dir']
 
 
-@then('the file should be renamed with a counter suffix')
+@then('the file should be renamed with a random hex suffix')
 def verify_file_renamed(context):
     """Verify file was renamed to avoid conflict"""
     moved_file = context['moved_file']
-    # Should have _1 or similar suffix
-    assert '_1' in moved_file.stem
+    # Should have an 8 hex digit suffix, e.g. test_invoice_1f2e3d4c
+    assert re.fullmatch(r'test_invoice_[0-9a-f]{8}', moved_file.stem)
 
 
 @then('both files should exist in the processed directory')
@@ -3,30 +3,33 @@ Unit tests for extractors
 """
 import pytest
 from unittest.mock import Mock, patch, MagicMock
-import json
 from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image
 
 from invoice_processor.extractors.ai_extractor import AIExtractor
-from invoice_processor.extractors.pdf_extractor import PDFExtractor
+from invoice_processor.extractors.pdf_extractor import PDFExtractor, set_render_threads
 from invoice_processor.extractors.image_extractor import ImageExtractor
+from invoice_processor.workflows import invoice_workflow
 
 
+@pytest.mark.extractor_ai
+@pytest.mark.usefixtures("mock_openai", "mock_anthropic")
 class TestAIExtractor:
     """Test AI extraction functionality"""
     
-    def test_init_with_env_vars(self, mock_env_vars):
+    def test_init_with_env_vars(self, mock_env_vars, mock_openai, mock_anthropic):
         """
         Given environment variables are set
         When initializing AIExtractor
         Then both clients should be initialized
         """
-        with patch('invoice_processor.extractors.ai_extractor.openai.OpenAI') as mock_openai, \
-             patch('invoice_processor.extractors.ai_extractor.Anthropic') as mock_anthropic:
-            
-            extractor = AIExtractor()
-            
-            mock_openai.assert_called_once()
-            mock_anthropic.assert_called_once_with(api_key="test-anthropic-key")
+        extractor = AIExtractor()
+        
+        mock_openai.assert_called_once()
+        mock_anthropic.assert_called_once_with(api_key="test-anthropic-key")
     
     def test_init_without_env_vars(self, monkeypatch):
         """
@@ -38,154 +41,228 @@ class TestAIExtractor:
         monkeypatch.delenv("OPENAI_API_KEY", raising=False)
         monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
         
-        with patch('invoice_processor.extractors.ai_extractor.openai.OpenAI') as mock_openai, \
-             patch('invoice_processor.extractors.ai_extractor.Anthropic') as mock_anthropic:
-            
-            extractor = AIExtractor()
-            
-            assert extractor.openai_client is None
-            assert extractor.anthropic_client is None
+        extractor = AIExtractor()
+        
+        assert extractor.openai_client is None
+        assert extractor.anthropic_client is None
     
-    def test_create_extraction_prompt(self, mock_env_vars):
+    def test_init_with_injected_clients(self, mock_env_vars, mock_openai, mock_anthropic):
+        """
+        Given OpenAI and Anthropic clients passed in
+        When initializing AIExtractor
+        Then the given clients should be used instead of creating new ones
+        """
+        openai_client, anthropic_client = Mock(), Mock()
+        
+        extractor = AIExtractor(openai_client=openai_client, anthropic_client=anthropic_client)
+        
+        assert extractor.openai_client is openai_client
+        assert extractor.anthropic_client is anthropic_client
+        mock_openai.assert_not_called()
+        mock_anthropic.assert_not_called()
+    
+    def test_extract_with_injected_clients_without_api_keys(self, monkeypatch, mock_openai,
+                                                            mock_anthropic_response, anthropic_response_factory):
+        """
+        Given injected clients where OpenAI fails, and no API keys in the environment
+        When extracting invoice data
+        Then the injected clients should be used, falling back to Anthropic
+        """
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+        monkeypatch.delenv("AI_CACHE_DIR", raising=False)
+        openai_client, anthropic_client = Mock(), Mock()
+        openai_client.chat.completions.create.side_effect = Exception("OpenAI Error")
+        anthropic_client.messages.create.return_value = anthropic_response_factory(mock_anthropic_response)
+        
+        extractor = AIExtractor(openai_client=openai_client, anthropic_client=anthropic_client)
+        result = extractor.extract_invoice_data("Invoice text", "test.pdf")
+        
+        assert result.header.vendor_name == "Anthropic Vendor"
+        openai_client.chat.completions.create.assert_called_once()
+        mock_openai.assert_not_called()
+    
+    def test_create_extraction_prompt(self, ai_extractor):
         """
         Given text content
         When creating extraction prompt
         Then prompt should contain text and proper structure
         """
-        extractor = AIExtractor()
         text = "Sample invoice text"
         
-        prompt = extractor.create_extraction_prompt(text)
+        prompt = ai_extractor.create_extraction_prompt(text)
         
         assert "Sample invoice text" in prompt
         assert "JSON" in prompt
         assert "header" in prompt
         assert "line_items" in prompt
     
-    def test_extract_with_openai_success(self, mock_env_vars, mock_openai_response):
+    def test_requests_share_prompt_prefix(self):
+        """
+        Given two different invoice texts
+        When extracting with each provider
+        Then the instructions should be sent as an identical system prefix and the text as the user message
+        """
+        openai_client, anthropic_client = Mock(), Mock()
+        extractor = AIExtractor(openai_client=openai_client, anthropic_client=anthropic_client)
+        
+        extractor.extract_with_openai("Invoice A")
+        extractor.extract_with_openai("Invoice B")
+        extractor.extract_with_anthropic("Invoice A")
+        
+        openai_a, openai_b = (call.kwargs for call in openai_client.chat.completions.create.call_args_list)
+        anthropic_a = anthropic_client.messages.create.call_args.kwargs
+        
+        assert openai_a["messages"][0] == openai_b["messages"][0]
+        assert openai_a["messages"][1]["content"] == "Invoice A"
+        assert openai_a["response_format"] == {"type": "json_object"}
+        assert "line_items" in openai_a["messages"][0]["content"]
+        assert anthropic_a["system"] == openai_a["messages"][0]["content"]
+        assert anthropic_a["messages"] == [{"role": "user", "content": "Invoice A"}]
+    
+    def test_extract_with_openai_success(self, mock_env_vars, mock_openai_response, mock_openai, openai_response_factory):
         """
         Given valid OpenAI response
         When extracting with OpenAI
         Then structured data should be returned
         """
-        with patch('invoice_processor.extractors.ai_extractor.openai.OpenAI') as mock_openai:
-            # Setup mock response
-            mock_response = Mock()
-            mock_choice = Mock()
-            mock_message = Mock()
-            mock_message.content = json.dumps(mock_openai_response)
-            mock_choice.message = mock_message
-            mock_response.choices = [mock_choice]
-            mock_openai.return_value.chat.completions.create.return_value = mock_response
-            
-            extractor = AIExtractor()
-            result = extractor.extract_with_openai("test text")
-            
-            assert result is not None
-            assert "header" in result
-            assert "line_items" in result
+        mock_openai.return_value.chat.completions.create.return_value = openai_response_factory(mock_openai_response)
+        
+        extractor = AIExtractor()
+        result = extractor.extract_with_openai("test text")
+        
+        assert result is not None
+        assert "header" in result
+        assert "line_items" in result
     
-    def test_extract_with_openai_failure(self, mock_env_vars):
+    def test_extract_with_anthropic_fenced_json(self, mock_env_vars, mock_anthropic_response, mock_anthropic_response_json, mock_anthropic):
+        """
+        Given an Anthropic response wrapped in a markdown code fence
+        When extracting with Anthropic
+        Then the fence should be stripped and the JSON parsed
+        """
+        fenced_response = SimpleNamespace(content=[SimpleNamespace(text=f"```json\n{mock_anthropic_response_json}\n```")])
+        mock_anthropic.return_value.messages.create.return_value = fenced_response
+        
+        extractor = AIExtractor()
+        result = extractor.extract_with_anthropic("test text")
+        
+        assert result == mock_anthropic_response
+    
+    def test_extract_with_openai_failure(self, mock_env_vars, mock_openai):
         """
         Given OpenAI API error
         When extracting with OpenAI
         Then None should be returned and error logged
         """
-        with patch('invoice_processor.extractors.ai_extractor.openai.OpenAI') as mock_openai:
-            mock_openai.return_value.chat.completions.create.side_effect = Exception("API Error")
-            
-            extractor = AIExtractor()
-            result = extractor.extract_with_openai("test text")
-            
-            assert result is None
+        mock_openai.return_value.chat.completions.create.side_effect = Exception("API Error")
+        
+        extractor = AIExtractor()
+        result = extractor.extract_with_openai("test text")
+        
+        assert result is None
     
-    def test_extract_with_anthropic_success(self, mock_env_vars, mock_anthropic_response):
+    def test_extract_with_anthropic_success(self, mock_env_vars, mock_anthropic_response, mock_anthropic, anthropic_response_factory):
         """
         Given valid Anthropic response
         When extracting with Anthropic
         Then structured data should be returned
         """
-        with patch('invoice_processor.extractors.ai_extractor.Anthropic') as mock_anthropic:
-            mock_response = Mock()
-            mock_content = Mock()
-            mock_content.text = json.dumps(mock_anthropic_response)
-            mock_response.content = [mock_content]
-            mock_anthropic.return_value.messages.create.return_value = mock_response
-            
-            extractor = AIExtractor()
-            result = extractor.extract_with_anthropic("test text")
-            
-            assert result is not None
-            assert "header" in result
-            assert "line_items" in result
+        mock_anthropic.return_value.messages.create.return_value = anthropic_response_factory(mock_anthropic_response)
+        
+        extractor = AIExtractor()
+        result = extractor.extract_with_anthropic("test text")
+        
+        assert result is not None
+        assert "header" in result
+        assert "line_items" in result
     
-    def test_extract_invoice_data_openai_success(self, mock_env_vars, mock_openai_response):
+    def test_extract_invoice_data_openai_success(self, mock_env_vars, mock_openai_response, mock_openai, openai_response_factory):
         """
         Given valid text and working OpenAI
         When extracting invoice data
         Then OpenAI should be used and invoice returned
         """
-        with patch('invoice_processor.extractors.ai_extractor.openai.OpenAI') as mock_openai, \
-             patch('invoice_processor.extractors.ai_extractor.Anthropic'):
-            
-            mock_response = Mock()
-            mock_choice = Mock()
-            mock_message = Mock()
-            mock_message.content = json.dumps(mock_openai_response)
-            mock_choice.message = mock_message
-            mock_response.choices = [mock_choice]
-            mock_openai.return_value.chat.completions.create.return_value = mock_response
-            
-            extractor = AIExtractor()
-            result = extractor.extract_invoice_data("test text", "test.pdf")
-            
-            assert result is not None
-            assert result.header.invoice_number == "AI-001"
-            assert len(result.line_items) == 1
+        mock_openai.return_value.chat.completions.create.return_value = openai_response_factory(mock_openai_response)
+        
+        extractor = AIExtractor()
+        result = extractor.extract_invoice_data("test text", "test.pdf")
+        
+        assert result is not None
+        assert result.header.invoice_number == "AI-001"
+        assert len(result.line_items) == 1
     
-    def test_extract_invoice_data_fallback_to_anthropic(self, mock_env_vars, mock_anthropic_response):
+    def test_extract_invoice_data_fallback_to_anthropic(self, mock_env_vars, mock_anthropic_response, mock_openai, mock_anthropic, anthropic_response_factory):
         """
         Given OpenAI fails and Anthropic succeeds
         When extracting invoice data
         Then Anthropic should be used as fallback
         """
-        with patch('invoice_processor.extractors.ai_extractor.openai.OpenAI') as mock_openai, \
-             patch('invoice_processor.extractors.ai_extractor.Anthropic') as mock_anthropic:
-            
-            # OpenAI fails
-            mock_openai.return_value.chat.completions.create.side_effect = Exception("OpenAI Error")
-            
-            # Anthropic succeeds
-            mock_response = Mock()
-            mock_content = Mock()
-            mock_content.text = json.dumps(mock_anthropic_response)
-            mock_response.content = [mock_content]
-            mock_anthropic.return_value.messages.create.return_value = mock_response
-            
-            extractor = AIExtractor()
-            result = extractor.extract_invoice_data("test text", "test.pdf")
-            
-            assert result is not None
-            assert result.header.vendor_name == "Anthropic Vendor"
+        # OpenAI fails
+        mock_openai.return_value.chat.completions.create.side_effect = Exception("OpenAI Error")
+        
+        # Anthropic succeeds
+        mock_anthropic.return_value.messages.create.return_value = anthropic_response_factory(mock_anthropic_response)
+        
+        extractor = AIExtractor()
+        result = extractor.extract_invoice_data("test text", "test.pdf")
+        
+        assert result is not None
+        assert result.header.vendor_name == "Anthropic Vendor"
     
-    def test_extract_invoice_data_both_fail(self, mock_env_vars):
+    def test_extract_invoice_data_both_fail(self, mock_env_vars, mock_openai, mock_anthropic):
         """
         Given both AI services fail
         When extracting invoice data
         Then None should be returned
         """
-        with patch('invoice_processor.extractors.ai_extractor.openai.OpenAI') as mock_openai, \
-             patch('invoice_processor.extractors.ai_extractor.Anthropic') as mock_anthropic:
-            
-            mock_openai.return_value.chat.completions.create.side_effect = Exception("OpenAI Error")
-            mock_anthropic.return_value.messages.create.side_effect = Exception("Anthropic Error")
-            
-            extractor = AIExtractor()
-            result = extractor.extract_invoice_data("test text", "test.pdf")
-            
-            assert result is None
+        mock_openai.return_value.chat.completions.create.side_effect = Exception("OpenAI Error")
+        mock_anthropic.return_value.messages.create.side_effect = Exception("Anthropic Error")
+        
+        extractor = AIExtractor()
+        result = extractor.extract_invoice_data("test text", "test.pdf")
+        
+        assert result is None
+    
+    def test_extract_invoice_data_uses_disk_cache(self, mock_env_vars, mock_openai_response, temp_dir, monkeypatch, mock_openai, openai_response_factory):
+        """
+        Given AI_CACHE_DIR is set and a text was already extracted
+        When extracting the same text again
+        Then the cached result should be used without calling the AI
+        """
+        monkeypatch.setenv("AI_CACHE_DIR", str(temp_dir / "ai_cache"))
+        
+        mock_create = mock_openai.return_value.chat.completions.create
+        mock_create.return_value = openai_response_factory(mock_openai_response)
+        
+        first = AIExtractor().extract_invoice_data("cached text", "first.pdf")
+        second = AIExtractor().extract_invoice_data("cached text", "second.pdf")
+        
+        assert mock_create.call_count == 1
+        assert second.header.invoice_number == first.header.invoice_number
+        assert second.file_path == "second.pdf"
+    
+    def test_extract_invoice_data_long_text_is_chunked(self, mock_env_vars, mock_openai_response, mock_openai, openai_response_factory):
+        """
+        Given invoice text longer than one chunk
+        When extracting invoice data
+        Then each chunk should be extracted and the line items merged
+        """
+        long_text = "\n".join(f"Line {i}: " + "x" * 90 for i in range(200))
+        
+        mock_create = mock_openai.return_value.chat.completions.create
+        mock_create.return_value = openai_response_factory(mock_openai_response)
+        
+        result = AIExtractor().extract_invoice_data(long_text, "long.pdf")
+        
+        assert mock_create.call_count == 3
+        assert all(len(call.kwargs["messages"][1]["content"]) <= 8000 for call in mock_create.call_args_list)
+        assert result.header.invoice_number == "AI-001"
+        assert len(result.line_items) == 3
+        assert result.raw_text == long_text
 
 
+@pytest.mark.extractor_pdf
 class TestPDFExtractor:
     """Test PDF extraction functionality"""
     
@@ -199,9 +276,8 @@ class TestPDFExtractor:
         
         # Mock PyPDF2 to return some text
         with patch('invoice_processor.extractors.pdf_extractor.PyPDF2.PdfReader') as mock_reader:
-            mock_page = Mock()
-            mock_page.extract_text.return_value = "Sample PDF text content"
-            mock_reader.return_value.pages = [mock_page]
+            page = SimpleNamespace(extract_text=lambda: "Sample PDF text content")
+            mock_reader.return_value.pages = [page]
             
             result = extractor.extract_text(sample_pdf_file)
             
@@ -216,25 +292,59 @@ class TestPDFExtractor:
         extractor = PDFExtractor()
         
         with patch('invoice_processor.extractors.pdf_extractor.PyPDF2.PdfReader') as mock_reader:
-            mock_page = Mock()
-            mock_page.extract_text.return_value = ""
-            mock_reader.return_value.pages = [mock_page]
+            page = SimpleNamespace(extract_text=lambda: "")
+            mock_reader.return_value.pages = [page]
             
             result = extractor.extract_text(sample_pdf_file)
             
             assert result is None
     
-    def test_extract_text_file_error(self, temp_dir):
+    def test_extract_text_cached_until_file_changes(self, sample_pdf_file):
+        """
+        Given a PDF that was already extracted
+        When extracting it again, before and after the file changes
+        Then the PDF should only be re-parsed once it has changed
+        """
+        extractor = PDFExtractor()
+        
+        with patch('invoice_processor.extractors.pdf_extractor.PyPDF2.PdfReader') as mock_reader:
+            page = SimpleNamespace(extract_text=lambda: "Cached PDF text")
+            mock_reader.return_value.pages = [page]
+            
+            assert extractor.extract_text(sample_pdf_file) == "Cached PDF text"
+            assert PDFExtractor().extract_text(sample_pdf_file) == "Cached PDF text"
+            assert mock_reader.call_count == 1
+            
+            sample_pdf_file.write_bytes(sample_pdf_file.read_bytes() + b"\n% edited")
+            extractor.extract_text(sample_pdf_file)
+            
+            assert mock_reader.call_count == 2
+    
+    def test_extract_text_error_not_cached(self, sample_pdf_file):
+        """
+        Given a PDF whose first read fails
+        When extracting it again without the file changing
+        Then the PDF should be re-read and its text returned
+        """
+        extractor = PDFExtractor()
+        page = SimpleNamespace(extract_text=lambda: "Text after retry")
+        
+        with patch('invoice_processor.extractors.pdf_extractor.PyPDF2.PdfReader',
+                   side_effect=[OSError("Transient read error"), SimpleNamespace(pages=[page])]):
+            assert extractor.extract_text(sample_pdf_file) is None
+            assert extractor.extract_text(sample_pdf_file) == "Text after retry"
+    
+    def test_extract_text_file_error(self):
         """
         Given an invalid PDF file
         When extracting text
         Then None should be returned and error logged
         """
         extractor = PDFExtractor()
-        invalid_file = temp_dir / "invalid.pdf"
-        invalid_file.write_text("Not a valid PDF")
         
-        result = extractor.extract_text(invalid_file)
+        # Any existing file will do, since the reader is made to reject it
+        with patch('invoice_processor.extractors.pdf_extractor.PyPDF2.PdfReader', side_effect=Exception("Not a valid PDF")):
+            result = extractor.extract_text(Path(__file__))
         
         assert result is None
     
@@ -254,6 +364,61 @@ class TestPDFExtractor:
             
             assert len(result) == 2
             assert all(img == mock_image for img in result)
+            assert mock_convert.call_args.kwargs["dpi"] == 200
+    
+    def test_convert_to_images_uses_render_thread_share(self, sample_pdf_file, monkeypatch):
+        """
+        Given a pool worker limited to one render thread
+        When converting to images with pdftoppm
+        Then only one pdftoppm process should be requested
+        """
+        # Restored after the test, whatever set_render_threads changes it to
+        monkeypatch.setattr('invoice_processor.extractors.pdf_extractor._render_threads', 4)
+        set_render_threads(1)
+        
+        with patch('invoice_processor.extractors.pdf_extractor.convert_from_path') as mock_convert:
+            PDFExtractor().convert_to_images(sample_pdf_file)
+            
+            assert mock_convert.call_args.kwargs["thread_count"] == 1
+    
+    def test_extract_text_with_pdfium(self, sample_pdf_file):
+        """
+        Given pypdfium2 is installed
+        When extracting text
+        Then PDFium should be used instead of PyPDF2
+        """
+        extractor = PDFExtractor()
+        mock_page = Mock()
+        mock_page.get_textpage.return_value.get_text_range.return_value = "PDFium line 1\r\nPDFium line 2"
+        
+        with patch('invoice_processor.extractors.pdf_extractor.pdfium', create=True) as mock_pdfium, \
+             patch('invoice_processor.extractors.pdf_extractor.PyPDF2.PdfReader') as mock_reader:
+            mock_pdfium.PdfDocument.return_value.__iter__ = Mock(return_value=iter([mock_page, mock_page]))
+            
+            result = extractor.extract_text(sample_pdf_file)
+            
+            assert result == "PDFium line 1\nPDFium line 2\nPDFium line 1\nPDFium line 2"
+            mock_reader.assert_not_called()
+            mock_pdfium.PdfDocument.return_value.close.assert_called_once()
+    
+    def test_convert_to_images_with_pdfium(self, sample_pdf_file):
+        """
+        Given pypdfium2 is installed
+        When converting to images
+        Then pages should be rendered in-process at the OCR DPI
+        """
+        extractor = PDFExtractor()
+        mock_page = Mock()
+        
+        with patch('invoice_processor.extractors.pdf_extractor.pdfium', create=True) as mock_pdfium, \
+             patch('invoice_processor.extractors.pdf_extractor.convert_from_path') as mock_convert:
+            mock_pdfium.PdfDocument.return_value.__iter__ = Mock(return_value=iter([mock_page]))
+            
+            result = extractor.convert_to_images(sample_pdf_file)
+            
+            assert result == [mock_page.render.return_value.to_pil.return_value]
+            mock_page.render.assert_called_once_with(scale=200 / 72)
+            mock_convert.assert_not_called()
     
     def test_convert_to_images_error(self, sample_pdf_file):
         """
@@ -271,6 +436,7 @@ class TestPDFExtractor:
             assert result == []
 
 
+@pytest.mark.extractor_image
 class TestImageExtractor:
     """Test image extraction functionality"""
     
@@ -286,51 +452,59 @@ class TestImageExtractor:
         assert '--oem' in extractor.tesseract_config
         assert '--psm' in extractor.tesseract_config
     
-    def test_preprocess_image_success(self, sample_image_file):
+    def test_ocr_psm_follows_page_orientation(self, mock_tesseract):
+        """
+        Given portrait and landscape page images
+        When running OCR
+        Then single-column mode should be used for portrait pages and automatic layout for landscape ones
         """
-        Given an image file
+        extractor = ImageExtractor()
+        portrait = np.zeros((300, 200), dtype=np.uint8)
+        landscape = np.zeros((200, 300), dtype=np.uint8)
+        
+        mock_tesseract.return_value = "text"
+        
+        extractor._run_ocr(portrait)
+        assert mock_tesseract.call_args.kwargs["config"] == "--oem 1 --psm 4"
+        
+        extractor._run_ocr(landscape)
+        assert mock_tesseract.call_args.kwargs["config"] == "--oem 1 --psm 3"
+    
+    def test_preprocess_image_success(self):
+        """
+        Given an RGB image
         When preprocessing
-        Then processed image should be returned
+        Then a binarized grayscale array of the same size should be returned
         """
         extractor = ImageExtractor()
+        image = Image.new('RGB', (40, 20), color='white')
         
-        with patch('invoice_processor.extractors.image_extractor.Image.open') as mock_open, \
-             patch('invoice_processor.extractors.image_extractor.cv2') as mock_cv2, \
-             patch('invoice_processor.extractors.image_extractor.np') as mock_np:
-            
-            mock_image = Mock()
-            mock_open.return_value = mock_image
-            
-            # Mock OpenCV operations
-            mock_cv2.cvtColor.return_value = mock_np.array([])
-            mock_cv2.GaussianBlur.return_value = mock_np.array([])
-            mock_cv2.adaptiveThreshold.return_value = mock_np.array([])
-            
-            # Mock PIL Image.fromarray
-            mock_processed = Mock()
-            with patch('invoice_processor.extractors.image_extractor.Image.fromarray', return_value=mock_processed):
-                result = extractor.preprocess_image(mock_image)
-                
-                assert result == mock_processed
+        result = extractor.preprocess_image(image)
+        
+        assert isinstance(result, np.ndarray)
+        assert result.shape == (20, 40)
+        assert set(np.unique(result)) <= {0, 255}
     
-    def test_preprocess_image_error_fallback(self, sample_image_file):
+    def test_preprocess_image_error_fallback(self, monkeypatch):
         """
         Given image preprocessing error
         When preprocessing
         Then original image should be returned
         """
         extractor = ImageExtractor()
+        image = Image.fromarray(np.zeros((4, 4, 3), dtype=np.uint8))
         
-        mock_image = Mock()
+        # Only the blur step fails; the grayscale conversion runs for real
+        monkeypatch.setattr(
+            'invoice_processor.extractors.image_extractor.cv2.GaussianBlur',
+            MagicMock(side_effect=Exception("CV2 Error"))
+        )
         
-        with patch('invoice_processor.extractors.image_extractor.cv2') as mock_cv2:
-            mock_cv2.cvtColor.side_effect = Exception("CV2 Error")
-            
-            result = extractor.preprocess_image(mock_image)
-            
-            assert result == mock_image
+        result = extractor.preprocess_image(image)
+        
+        assert result is image
     
-    def test_extract_text_from_image_success(self, sample_image_file):
+    def test_extract_text_from_image_success(self, monkeypatch, mock_tesseract):
         """
         Given an image with text
         When extracting text using OCR
@@ -340,15 +514,14 @@ class TestImageExtractor:
         
         mock_image = Mock()
         
-        with patch('invoice_processor.extractors.image_extractor.pytesseract.image_to_string') as mock_tesseract:
-            mock_tesseract.return_value = "Extracted text from image"
-            
-            with patch.object(extractor, 'preprocess_image', return_value=mock_image):
-                result = extractor.extract_text_from_image(mock_image)
-                
-                assert result == "Extracted text from image"
+        mock_tesseract.return_value = "Extracted text from image"
+        
+        monkeypatch.setattr(extractor, 'preprocess_image', lambda image: mock_image)
+        result = extractor.extract_text_from_image(mock_image)
+        
+        assert result == "Extracted text from image"
     
-    def test_extract_text_from_image_no_text(self, sample_image_file):
+    def test_extract_text_from_image_no_text(self, monkeypatch, mock_tesseract):
         """
         Given an image with no readable text
         When extracting text using OCR
@@ -358,15 +531,14 @@ class TestImageExtractor:
         
         mock_image = Mock()
         
-        with patch('invoice_processor.extractors.image_extractor.pytesseract.image_to_string') as mock_tesseract:
-            mock_tesseract.return_value = ""
-            
-            with patch.object(extractor, 'preprocess_image', return_value=mock_image):
-                result = extractor.extract_text_from_image(mock_image)
-                
-                assert result is None
+        mock_tesseract.return_value = ""
+        
+        monkeypatch.setattr(extractor, 'preprocess_image', lambda image: mock_image)
+        result = extractor.extract_text_from_image(mock_image)
+        
+        assert result is None
     
-    def test_extract_text_from_image_error(self, sample_image_file):
+    def test_extract_text_from_image_error(self, monkeypatch, mock_tesseract):
         """
         Given OCR error
         When extracting text from image
@@ -376,15 +548,50 @@ class TestImageExtractor:
         
         mock_image = Mock()
         
-        with patch('invoice_processor.extractors.image_extractor.pytesseract.image_to_string') as mock_tesseract:
-            mock_tesseract.side_effect = Exception("OCR Error")
-            
-            with patch.object(extractor, 'preprocess_image', return_value=mock_image):
-                result = extractor.extract_text_from_image(mock_image)
-                
-                assert result is None
+        mock_tesseract.side_effect = Exception("OCR Error")
+        
+        monkeypatch.setattr(extractor, 'preprocess_image', lambda image: mock_image)
+        result = extractor.extract_text_from_image(mock_image)
+        
+        assert result is None
     
-    def test_extract_text_from_file_success(self, sample_image_file):
+    def test_extract_text_from_image_with_tesserocr(self, mock_tesserocr, mock_tesseract):
+        """
+        Given tesserocr is available
+        When extracting text from several images
+        Then one in-process Tesseract API should be reused instead of pytesseract
+        """
+        extractor = ImageExtractor()
+        image = Image.new('RGB', (40, 20), color='white')
+
+        mock_tesserocr.return_value.GetUTF8Text.return_value = "In-process OCR text"
+
+        first = extractor.extract_text_from_image(image)
+        second = extractor.extract_text_from_image(image)
+
+        assert first == second == "In-process OCR text"
+        mock_tesserocr.assert_called_once()
+        mock_tesseract.assert_not_called()
+
+    def test_extract_text_from_image_tesserocr_init_failure(self, monkeypatch, mock_tesserocr, mock_tesseract):
+        """
+        Given tesserocr is installed but cannot load its language data
+        When extracting text from an image
+        Then pytesseract should be used instead
+        """
+        extractor = ImageExtractor()
+        mock_image = Mock()
+
+        monkeypatch.setattr(extractor, 'preprocess_image', lambda image: mock_image)
+        
+        mock_tesserocr.side_effect = RuntimeError("Failed to init API, possibly an invalid tessdata path")
+        mock_tesseract.return_value = "CLI OCR text"
+
+        result = extractor.extract_text_from_image(mock_image)
+
+        assert result == "CLI OCR text"
+
+    def test_extract_text_from_file_success(self, sample_image_file, monkeypatch):
         """
         Given an image file path
         When extracting text from file
@@ -392,16 +599,33 @@ class TestImageExtractor:
         """
         extractor = ImageExtractor()
         
-        with patch('invoice_processor.extractors.image_extractor.Image.open') as mock_open:
-            mock_image = Mock()
-            mock_open.return_value = mock_image
-            
-            with patch.object(extractor, 'extract_text_from_image', return_value="File text"):
-                result = extractor.extract_text_from_file(sample_image_file)
-                
-                assert result == "File text"
+        mock_open = MagicMock()
+        monkeypatch.setattr('invoice_processor.extractors.image_extractor.Image.open', mock_open)
+        mock_image = Mock()
+        mock_open.return_value = mock_image
+        
+        monkeypatch.setattr(extractor, 'extract_text_from_image', lambda image: "File text")
+        result = extractor.extract_text_from_file(sample_image_file)
+        
+        assert result == "File text"
+    
+    def test_extract_text_from_file_downscales_large_images(self, temp_dir, monkeypatch):
+        """
+        Given a large phone-camera JPEG
+        When extracting text from file
+        Then the image should be reduced to the OCR size before preprocessing
+        """
+        extractor = ImageExtractor()
+        photo = temp_dir / "photo.jpg"
+        Image.new('RGB', (4800, 3600), color='white').save(photo)
+        
+        mock_extract = MagicMock(return_value="File text")
+        monkeypatch.setattr(extractor, 'extract_text_from_image', mock_extract)
+        extractor.extract_text_from_file(photo)
+        
+        assert max(mock_extract.call_args.args[0].size) <= 2400
     
-    def test_extract_text_from_file_error(self, temp_dir):
+    def test_extract_text_from_file_error(self, monkeypatch):
         """
         Given invalid image file
         When extracting text from file
@@ -409,60 +633,67 @@ class TestImageExtractor:
         """
         extractor = ImageExtractor()
         
-        invalid_file = temp_dir / "invalid.png"
-        invalid_file.write_text("Not an image")
+        monkeypatch.setattr(
+            'invoice_processor.extractors.image_extractor.Image.open',
+            MagicMock(side_effect=OSError("cannot identify image file"))
+        )
         
-        result = extractor.extract_text_from_file(invalid_file)
+        result = extractor.extract_text_from_file(Path("invalid.png"))
         
         assert result is None
 
 
+def _run_pdf_ocr_workflow(monkeypatch, pdf_text, images, ocr_text):
+    """Run the workflow's PDF text extraction with the extractor results pinned to the given values"""
+    pdf_extractor = PDFExtractor()
+    image_extractor = ImageExtractor()
+    monkeypatch.setattr(pdf_extractor, 'extract_text', lambda file_path: pdf_text)
+    monkeypatch.setattr(pdf_extractor, 'convert_to_images', lambda file_path: images)
+    monkeypatch.setattr(image_extractor, 'extract_text_from_image', lambda image: ocr_text)
+    
+    extractors = {PDFExtractor: pdf_extractor, ImageExtractor: image_extractor}
+    monkeypatch.setattr(invoice_workflow, '_get_extractor', extractors.__getitem__)
+    return invoice_workflow.extract_text_from_file(Path("invoice.pdf"))
+
+
+@pytest.mark.integration
+@pytest.mark.slow
 class TestExtractorsIntegration:
     """Integration tests for extractors working together"""
     
-    def test_pdf_with_ocr_fallback_workflow(self, sample_pdf_file):
-        """
-        Given PDF extraction fails and OCR is needed
-        When processing through complete workflow
-        Then OCR should be applied successfully
+    @pytest.mark.parametrize("pdf_text, images, ocr_text, expected", [
+        ("Direct PDF text " * 5, ["page"], "OCR text", "Direct PDF text " * 5),
+        (None, ["page"], "OCR text", "Page 1:\nOCR text"),
+        (None, ["page 1", "page 2"], "OCR text", "Page 1:\nOCR text\n\nPage 2:\nOCR text"),
+        (None, [], "OCR text", None),
+        (None, ["page"], None, None),
+    ])
+    def test_pdf_with_ocr_fallback_workflow(self, monkeypatch, pdf_text, images, ocr_text, expected):
+        """
+        Given a PDF whose direct text extraction may fail
+        When extracting text through the workflow
+        Then OCR should be applied page by page only when the direct text is missing
+        """
+        result = _run_pdf_ocr_workflow(monkeypatch, pdf_text, images, ocr_text)
+        
+        assert result == expected
+    
+    @pytest.mark.parametrize("env_key, client_attr, other_attr", [
+        ("OPENAI_API_KEY", "openai_client", "anthropic_client"),
+        ("ANTHROPIC_API_KEY", "anthropic_client", "openai_client"),
+    ])
+    def test_ai_extractor_with_different_providers(self, monkeypatch, mock_openai, mock_anthropic,
+                                                   env_key, client_attr, other_attr):
+        """
+        Given only one AI provider's API key is set
+        When initializing AIExtractor
+        Then only that provider's client should be created
         """
-        pdf_extractor = PDFExtractor()
-        image_extractor = ImageExtractor()
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+        monkeypatch.setenv(env_key, "test-key")
         
-        # Mock PDF extraction to fail
-        with patch.object(pdf_extractor, 'extract_text', return_value=None), \
-             patch.object(pdf_extractor, 'convert_to_images') as mock_convert, \
-             patch.object(image_extractor, 'extract_text_from_image', return_value="OCR text"):
-            
-            mock_image = Mock()
-            mock_convert.return_value = [mock_image]
-            
-            # Simulate workflow
-            pdf_text = pdf_extractor.extract_text(sample_pdf_file)
-            assert pdf_text is None
-            
-            images = pdf_extractor.convert_to_images(sample_pdf_file)
-            assert len(images) == 1
-            
-            ocr_text = image_extractor.extract_text_from_image(images[0])
-            assert ocr_text == "OCR text"
-    
-    def test_ai_extractor_with_different_providers(self, mock_env_vars):
-        """
-        Given different AI provider configurations
-        When extracting with AI
-        Then appropriate provider should be used
-        """
-        # Test with only OpenAI
-        with patch.dict('os.environ', {'OPENAI_API_KEY': 'test-key'}, clear=True):
-            with patch('invoice_processor.extractors.ai_extractor.openai.OpenAI') as mock_openai:
-                extractor = AIExtractor()
-                assert extractor.openai_client is not None
-                assert extractor.anthropic_client is None
-        
-        # Test with only Anthropic
-        with patch.dict('os.environ', {'ANTHROPIC_API_KEY': 'test-key'}, clear=True):
-            with patch('invoice_processor.extractors.ai_extractor.Anthropic') as mock_anthropic:
-                extractor = AIExtractor()
-                assert extractor.openai_client is None
-                assert extractor.anthropic_client is not None
\ No newline at end of file
+        extractor = AIExtractor()
+        
+        assert getattr(extractor, client_attr) is not None
+        assert getattr(extractor, other_attr) is None
\ No newline at end of file
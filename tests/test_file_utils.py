@@ -1,12 +1,17 @@
 """
 Unit tests for file utilities
 """
+import errno
+import os
+import re
 import pytest
 from pathlib import Path
 from unittest.mock import patch, mock_open
 
+from invoice_processor.utils import file_utils
 from invoice_processor.utils.file_utils import (
-    get_invoice_files, move_processed_file, ensure_directory, SUPPORTED_EXTENSIONS
+    get_invoice_files, iter_invoice_files, move_processed_file, ensure_directory,
+    SUPPORTED_EXTENSIONS
 )
 
 
@@ -97,6 +102,76 @@ class TestGetInvoiceFiles:
         
         assert len(files) == 3
     
+    def test_get_files_recursive_mixed_case_skips_directories(self, temp_dir):
+        """
+        Given nested files with mixed case extensions and a directory named like an invoice
+        When searching recursively
+        Then only the files should be found
+        """
+        nested = temp_dir / "vendor" / "archive.pdf"
+        nested.mkdir(parents=True)
+        (nested / "scan.JPG").write_text("content")
+        (temp_dir / "vendor" / "invoice.Pdf").write_text("content")
+        
+        files = get_invoice_files(temp_dir, recursive=True)
+        
+        assert sorted(f.name for f in files) == ["invoice.Pdf", "scan.JPG"]
+        assert all(f.is_file() for f in files)
+    
+    def test_get_files_recursive_skips_unreadable_directories(self, temp_dir, monkeypatch):
+        """
+        Given a subdirectory that cannot be listed
+        When searching recursively
+        Then files elsewhere should still be found
+        """
+        locked = temp_dir / "locked"
+        locked.mkdir()
+        (locked / "hidden.pdf").write_text("content")
+        (temp_dir / "visible.pdf").write_text("content")
+        
+        real_scandir = os.scandir
+        
+        def scandir(path):
+            if path == str(locked):
+                raise PermissionError(13, "Permission denied", path)
+            return real_scandir(path)
+        monkeypatch.setattr('invoice_processor.utils.file_utils.os.scandir', scandir)
+        
+        files = get_invoice_files(temp_dir, recursive=True)
+        
+        assert [f.name for f in files] == ["visible.pdf"]
+    
+    def test_iter_invoice_files_matches_sorted_list(self, input_directory_structure):
+        """
+        Given a nested input directory
+        When streaming files with iter_invoice_files
+        Then the same files should be yielded as get_invoice_files returns, in any order
+        """
+        streamed = iter_invoice_files(input_directory_structure)
+        
+        assert sorted(streamed, key=str) == get_invoice_files(input_directory_structure)
+    
+    def test_get_files_walks_many_subdirectories_in_threads(self, temp_dir, monkeypatch):
+        """
+        Given a few top-level subdirectories, and then enough to reach the parallel threshold
+        When searching recursively
+        Then only the larger tree should be walked in a thread pool, finding the same files either way
+        """
+        pools = []
+        real_pool = file_utils.ThreadPoolExecutor
+        monkeypatch.setattr(file_utils, 'ThreadPoolExecutor', lambda **kwargs: pools.append(kwargs) or real_pool(**kwargs))
+        
+        for count in (2, file_utils.PARALLEL_WALK_MIN_SUBDIRS):
+            for index in range(count):
+                (temp_dir / f"vendor_{index:02d}").mkdir(exist_ok=True)
+                (temp_dir / f"vendor_{index:02d}" / "invoice.pdf").write_text("content")
+            
+            files = get_invoice_files(temp_dir, recursive=True)
+            
+            assert [f.parent.name for f in files] == [f"vendor_{index:02d}" for index in range(count)]
+        
+        assert pools == [{"max_workers": file_utils.WALK_WORKERS}]
+    
     def test_get_files_sorted_by_path(self, temp_dir):
         """
         Given multiple files
@@ -175,11 +250,27 @@ class TestMoveProcessedFile:
         assert result.exists()
         assert not source_file.exists()
     
+    def test_move_file_preserve_structure_from_current_directory(self, temp_dir, monkeypatch):
+        """
+        Given a source file found below the current directory by a relative search
+        When moving with '.' as input_base_dir
+        Then its subdirectory should still be preserved
+        """
+        (temp_dir / "vendor_a").mkdir()
+        (temp_dir / "vendor_a" / "invoice.pdf").write_text("content")
+        monkeypatch.chdir(temp_dir)
+        
+        source_file = get_invoice_files(Path("."))[0]
+        result = move_processed_file(source_file, Path("processed"), Path("."))
+        
+        assert result == Path("processed") / "vendor_a" / "invoice.pdf"
+        assert result.exists()
+    
     def test_move_file_handle_name_conflict(self, temp_dir):
         """
         Given a destination file that already exists
         When moving a new file with same name
-        Then new file should be renamed with counter
+        Then new file should be renamed with a random suffix
         """
         source_file = temp_dir / "source.pdf"
         source_file.write_text("new content")
@@ -193,8 +284,8 @@ class TestMoveProcessedFile:
         
         result = move_processed_file(source_file, dest_dir)
         
-        # Should be renamed with counter
-        assert "_1" in result.name
+        # Should be renamed with a random suffix
+        assert re.fullmatch(r"source_[0-9a-f]{8}\.pdf", result.name)
         assert result.exists()
         assert existing_file.exists()  # Original should still exist
         assert result.read_text() == "new content"
@@ -203,7 +294,7 @@ class TestMoveProcessedFile:
         """
         Given multiple files with same name already exist
         When moving files with conflicts
-        Then counter should increment properly
+        Then each move should get its own unique name
         """
         dest_dir = temp_dir / "destination"
         dest_dir.mkdir()
@@ -218,8 +309,96 @@ class TestMoveProcessedFile:
         
         result = move_processed_file(source_file, dest_dir)
         
-        assert "test_2.pdf" in result.name
-        assert result.exists()
+        source_file.write_text("another new file")
+        second = move_processed_file(source_file, dest_dir)
+        
+        assert result != second
+        assert result.read_text() == "new file"
+        assert second.read_text() == "another new file"
+        assert (dest_dir / "test_1.pdf").read_text() == "first conflict"
+    
+    def test_move_file_retries_name_claimed_concurrently(self, temp_dir, monkeypatch):
+        """
+        Given a destination name that another mover claims right after it was found free
+        When moving the file
+        Then the other file should be kept and the move should get a suffixed name
+        """
+        source_file = temp_dir / "race.pdf"
+        source_file.write_text("mine")
+        dest_dir = temp_dir / "destination"
+        dest_dir.mkdir()
+        
+        real_open = os.open
+        def open_after_other_mover(path, flags, *args):
+            if Path(path).name == "race.pdf" and not (dest_dir / "race.pdf").exists():
+                (dest_dir / "race.pdf").write_text("theirs")
+            return real_open(path, flags, *args)
+        monkeypatch.setattr('invoice_processor.utils.file_utils.os.open', open_after_other_mover)
+        
+        result = move_processed_file(source_file, dest_dir)
+        
+        assert re.fullmatch(r"race_[0-9a-f]{8}\.pdf", result.name)
+        assert result.read_text() == "mine"
+        assert (dest_dir / "race.pdf").read_text() == "theirs"
+    
+    def test_move_file_failure_releases_claimed_name(self, temp_dir):
+        """
+        Given a source file that does not exist
+        When moving it
+        Then the error should propagate and no empty file should be left in the destination
+        """
+        dest_dir = temp_dir / "destination"
+        dest_dir.mkdir()
+        
+        with pytest.raises(FileNotFoundError):
+            move_processed_file(temp_dir / "missing.pdf", dest_dir)
+        
+        assert list(dest_dir.iterdir()) == []
+    
+    def test_move_file_across_filesystems(self, temp_dir, monkeypatch):
+        """
+        Given a destination on a different filesystem, so a rename is refused
+        When moving the file
+        Then it should be copied over and the source removed
+        """
+        source_file = temp_dir / "remote.pdf"
+        source_file.write_text("content")
+        
+        def cross_device_replace(source, destination):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        monkeypatch.setattr('invoice_processor.utils.file_utils.os.replace', cross_device_replace)
+        
+        result = move_processed_file(source_file, temp_dir / "destination")
+        
+        assert result.read_text() == "content"
+        assert not source_file.exists()
+    
+    def test_move_file_creates_destination_directory_once(self, temp_dir, monkeypatch):
+        """
+        Given several files moved into the same destination directory
+        When moving them one after another
+        Then the directory should only be ensured once, and recreated if it disappears
+        """
+        ensured = []
+        monkeypatch.setattr(
+            'invoice_processor.utils.file_utils.ensure_directory',
+            lambda path: (ensured.append(path), path.mkdir(parents=True, exist_ok=True))
+        )
+        dest_dir = temp_dir / "destination"
+        
+        for name in ("a.pdf", "b.pdf"):
+            (temp_dir / name).write_text(name)
+            move_processed_file(temp_dir / name, dest_dir)
+        
+        assert ensured == [dest_dir]
+        
+        # A directory removed behind the cache's back is recreated on the next move
+        for moved in dest_dir.iterdir():
+            moved.unlink()
+        dest_dir.rmdir()
+        (temp_dir / "c.pdf").write_text("c.pdf")
+        
+        assert move_processed_file(temp_dir / "c.pdf", dest_dir).exists()
     
     def test_move_file_without_base_dir_fallback(self, temp_dir):
         """
@@ -5,7 +5,7 @@ import pytest
 import os
 import json
 from pathlib import Path
-from unittest.mock import patch, Mock, MagicMock
+from unittest.mock import ANY, patch, Mock, MagicMock
 import pandas as pd
 from decimal import Decimal
 
@@ -336,7 +336,7 @@ class TestEndToEndIntegration:
         invoice_file = input_dir / "cli_test.pdf"
         invoice_file.write_text(sample_pdf_content)
         
-        with patch('invoice_processor.main.run_invoice_processing') as mock_process, \
+        with patch('invoice_processor.workflows.invoice_workflow.run_invoice_processing') as mock_process, \
              patch('invoice_processor.main.os.getenv') as mock_getenv:
             
             # Setup environment
@@ -362,7 +362,9 @@ class TestEndToEndIntegration:
             mock_process.assert_called_once_with(
                 str(input_dir),
                 str(output_dir), 
-                str(processed_dir)
+                str(processed_dir),
+                max_workers=ANY,
+                on_progress=ANY
             )
 
     def test_large_batch_processing_integration(self, temp_dir, sample_pdf_content):
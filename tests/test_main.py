@@ -2,7 +2,7 @@
 Unit tests for main CLI module
 """
 import pytest
-from unittest.mock import Mock, patch, call
+from unittest.mock import ANY, Mock, patch, call
 from pathlib import Path
 import os
 
@@ -33,7 +33,7 @@ class TestMainCLI:
         
         input_dir.mkdir()
         
-        with patch('invoice_processor.main.run_invoice_processing') as mock_process, \
+        with patch('invoice_processor.workflows.invoice_workflow.run_invoice_processing') as mock_process, \
              patch('invoice_processor.main.os.getenv') as mock_getenv:
             
             mock_getenv.side_effect = lambda key: "test-key" if "API_KEY" in key else None
@@ -56,7 +56,7 @@ class TestMainCLI:
         When running process command
         Then default directories should be used
         """
-        with patch('invoice_processor.main.run_invoice_processing') as mock_process, \
+        with patch('invoice_processor.workflows.invoice_workflow.run_invoice_processing') as mock_process, \
              patch('invoice_processor.main.Path.mkdir'), \
              patch('invoice_processor.main.os.getenv') as mock_getenv:
             
@@ -66,7 +66,9 @@ class TestMainCLI:
             result = self.runner.invoke(app, ['process'])
             
             assert result.exit_code == 0
-            mock_process.assert_called_once_with("data/input", "data/output", "data/processed")
+            mock_process.assert_called_once_with(
+                "data/input", "data/output", "data/processed", max_workers=ANY, on_progress=ANY
+            )
     
     def test_process_command_no_api_keys(self, temp_dir):
         """
@@ -77,7 +79,7 @@ class TestMainCLI:
         input_dir = temp_dir / "input"
         input_dir.mkdir()
         
-        with patch('invoice_processor.main.run_invoice_processing') as mock_process, \
+        with patch('invoice_processor.workflows.invoice_workflow.run_invoice_processing') as mock_process, \
              patch('invoice_processor.main.os.getenv', return_value=None):
             
             mock_process.return_value = "Processing with OCR only"
@@ -97,7 +99,7 @@ class TestMainCLI:
         input_dir = temp_dir / "input"
         input_dir.mkdir()
         
-        with patch('invoice_processor.main.run_invoice_processing') as mock_process, \
+        with patch('invoice_processor.workflows.invoice_workflow.run_invoice_processing') as mock_process, \
              patch('invoice_processor.main.os.getenv') as mock_getenv:
             
             mock_getenv.side_effect = lambda key: "openai-key" if key == "OPENAI_API_KEY" else None
@@ -117,7 +119,7 @@ class TestMainCLI:
         input_dir = temp_dir / "input"
         input_dir.mkdir()
         
-        with patch('invoice_processor.main.run_invoice_processing') as mock_process, \
+        with patch('invoice_processor.workflows.invoice_workflow.run_invoice_processing') as mock_process, \
              patch('invoice_processor.main.os.getenv') as mock_getenv:
             
             def mock_env(key):
@@ -145,7 +147,7 @@ class TestMainCLI:
         output_dir = temp_dir / "new_output"
         processed_dir = temp_dir / "new_processed"
         
-        with patch('invoice_processor.main.run_invoice_processing') as mock_process, \
+        with patch('invoice_processor.workflows.invoice_workflow.run_invoice_processing') as mock_process, \
              patch('invoice_processor.main.os.getenv') as mock_getenv:
             
             mock_getenv.side_effect = lambda key: "test-key" if "API_KEY" in key else None
@@ -172,7 +174,7 @@ class TestMainCLI:
         input_dir = temp_dir / "input"
         input_dir.mkdir()
         
-        with patch('invoice_processor.main.run_invoice_processing') as mock_process, \
+        with patch('invoice_processor.workflows.invoice_workflow.run_invoice_processing') as mock_process, \
              patch('invoice_processor.main.os.getenv') as mock_getenv:
             
             mock_getenv.side_effect = lambda key: "test-key" if "API_KEY" in key else None
@@ -332,13 +334,16 @@ class TestMainCLIIntegration:
         """Setup CLI runner for each test"""
         self.runner = CliRunner()
     
-    def test_complete_workflow_through_cli(self, temp_dir):
+    def test_complete_workflow_through_cli(self, temp_dir, monkeypatch):
         """
         Given complete CLI workflow
         When running setup, process, and status commands
         Then all should work together correctly
         """
-        with patch('invoice_processor.main.run_invoice_processing') as mock_process, \
+        # setup writes data/ and .env into the working directory
+        monkeypatch.chdir(temp_dir)
+        
+        with patch('invoice_processor.workflows.invoice_workflow.run_invoice_processing') as mock_process, \
              patch('invoice_processor.main.os.getenv') as mock_getenv:
             
             mock_getenv.side_effect = lambda key: "test-key" if "API_KEY" in key else None
@@ -373,7 +378,7 @@ class TestMainCLIIntegration:
         input_dir = temp_dir / "input"
         input_dir.mkdir()
         
-        with patch('invoice_processor.main.run_invoice_processing') as mock_process:
+        with patch('invoice_processor.workflows.invoice_workflow.run_invoice_processing') as mock_process:
             mock_process.return_value = "Processing complete"
             
             result = self.runner.invoke(app, ['process', '--input', str(input_dir)])
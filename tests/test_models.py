@@ -5,6 +5,8 @@ import pytest
 from datetime import datetime, date
 from decimal import Decimal
 
+from pydantic import ValidationError
+
 from invoice_processor.models.invoice import (
     InvoiceHeader, InvoiceLineItem, Invoice, FlatInvoiceRecord
 )
@@ -251,6 +253,28 @@ class TestFlatInvoiceRecord:
         assert record_dict['invoice_number'] == "SER-001"
         assert 'file_path' in record_dict
 
+    def test_flat_record_is_immutable(self):
+        """
+        Given a FlatInvoiceRecord
+        When assigning to a field
+        Then a validation error should be raised
+        """
+        record = FlatInvoiceRecord(item_description="Test item", file_path="frozen.pdf")
+        
+        with pytest.raises(ValidationError):
+            record.vendor_name = "Changed"
+    
+    def test_models_ignore_unknown_fields(self):
+        """
+        Given AI output with keys outside the schema
+        When creating models
+        Then the unknown keys should be dropped
+        """
+        header = InvoiceHeader(invoice_number="EXT-001", payment_terms="Net 30")
+        
+        assert header.invoice_number == "EXT-001"
+        assert not hasattr(header, "payment_terms")
+
 
 class TestModelValidation:
     """Test model validation edge cases"""
@@ -163,6 +163,45 @@ class TestInvoiceSummaryGenerator:
         assert summary['max_invoice'] == 200.0
         assert 'EUR' in summary['currencies']
     
+    def test_generate_financial_summary_sums_exact_cents(self):
+        """
+        Given invoice totals that are not exact in binary floating point
+        When generating financial summary
+        Then totals should be exact to the cent
+        """
+        generator = InvoiceSummaryGenerator()
+        
+        records = [
+            FlatInvoiceRecord(vendor_name="Vendor", total_amount=amount, item_description="Item",
+                              file_path=f"file{i}.pdf")
+            for i, amount in enumerate(["0.10", "0.20", "1234.56"])
+        ]
+        
+        summary = generator.generate_financial_summary(records)
+        
+        assert str(summary['total_value']) == "1234.86"
+        assert str(summary['min_invoice']) == "0.10"
+        assert str(summary['average_invoice_value']) == "411.62"
+    
+    def test_generate_financial_summary_keeps_sub_cent_amounts(self):
+        """
+        Given invoice totals with fractions of a cent
+        When generating financial summary
+        Then they should be summed without rounding to cents
+        """
+        generator = InvoiceSummaryGenerator()
+        
+        records = [
+            FlatInvoiceRecord(vendor_name="Vendor", total_amount=amount, item_description="Item",
+                              file_path=f"file{i}.pdf")
+            for i, amount in enumerate(["0.004", "0.004", "12345678901234.561"])
+        ]
+        
+        summary = generator.generate_financial_summary(records)
+        
+        assert str(summary['total_value']) == "12345678901234.569"
+        assert str(summary['min_invoice']) == "0.004"
+    
     def test_generate_financial_summary_no_valid_data(self):
         """
         Given records without valid financial data
@@ -210,6 +249,43 @@ class TestInvoiceSummaryGenerator:
         assert "Total Files Processed: 2" in report
         assert "Success Rate: 100.0%" in report
     
+    def test_detailed_report_lists_large_tables_as_csv(self, temp_dir):
+        """
+        Given more invoices than the formatted table limit
+        When generating the detailed report
+        Then the invoice table should be listed as CSV rows
+        """
+        generator = InvoiceSummaryGenerator(str(temp_dir))
+        records = [
+            FlatInvoiceRecord(vendor_name="Vendor", item_description="Item", file_path=f"invoice_{i}.pdf")
+            for i in range(201)
+        ]
+        stats = generator.analyze_processing_results(records)
+        
+        report = generator.generate_detailed_summary_report(records, stats, "test.csv")
+        
+        assert "File,Invoice Number,Date,Vendor" in report
+        assert "invoice_200.pdf,N/A,N/A,Vendor" in report
+    
+    def test_detailed_report_status_breakdown(self, temp_dir):
+        """
+        Given AI-extracted and OCR-only invoices
+        When generating the detailed report
+        Then status and quality breakdowns should count invoices, most common first
+        """
+        generator = InvoiceSummaryGenerator(str(temp_dir))
+        records = [
+            FlatInvoiceRecord(vendor_name="Unknown (OCR only)", item_description="OCR Text", file_path="a.pdf"),
+            FlatInvoiceRecord(vendor_name="Vendor", item_description="Item", file_path="b.pdf"),
+            FlatInvoiceRecord(vendor_name="Vendor", item_description="Item", file_path="c.pdf"),
+        ]
+        stats = generator.analyze_processing_results(records)
+        
+        report = generator.generate_detailed_summary_report(records, stats, "test.csv")
+        
+        assert "AI Extracted: 2 files\nOCR Only: 1 files" in report
+        assert "  Good: 2 files\n  Poor: 1 files" in report
+    
     def test_save_summary_report(self, sample_flat_records, temp_dir):
         """
         Given records and output directory
@@ -225,6 +301,19 @@ class TestInvoiceSummaryGenerator:
             assert "invoice_processing_summary_" in result_path
             mock_file.assert_called_once()
     
+    def test_save_summary_report_groups_records_once(self, sample_flat_records, temp_dir):
+        """
+        Given records and output directory
+        When saving summary report
+        Then records should be grouped by file only once for all summaries
+        """
+        generator = InvoiceSummaryGenerator(str(temp_dir))
+        
+        with patch.object(generator, '_index_by_file', wraps=generator._index_by_file) as mock_index:
+            generator.save_summary_report(sample_flat_records, "test.csv")
+            
+            mock_index.assert_called_once_with(sample_flat_records)
+    
     def test_save_summary_table(self, sample_flat_records, temp_dir):
         """
         Given records and output directory  
@@ -240,6 +329,20 @@ class TestInvoiceSummaryGenerator:
             assert "invoice_summary_table_" in result_path
             mock_to_csv.assert_called_once()
     
+    def test_save_summaries_use_run_timestamp(self, sample_flat_records, temp_dir):
+        """
+        Given a run timestamp
+        When saving the summary report and table
+        Then both file names should use that timestamp
+        """
+        generator = InvoiceSummaryGenerator(str(temp_dir))
+        
+        report_path = generator.save_summary_report(sample_flat_records, "test.csv", "20250101_120000")
+        table_path = generator.save_summary_table(sample_flat_records, "20250101_120000")
+        
+        assert report_path.endswith("invoice_processing_summary_20250101_120000.txt")
+        assert table_path.endswith("invoice_summary_table_20250101_120000.csv")
+    
     def test_save_summary_table_empty_data(self, temp_dir):
         """
         Given empty records
@@ -375,6 +478,23 @@ class TestSummaryGeneratorEdgeCases:
         assert "..." in products_cell  # Should be truncated
         assert "Product 1" in products_cell
         assert "Product 2" in products_cell
+    
+    def test_index_keeps_only_product_preview(self):
+        """
+        Given an invoice with hundreds of line items
+        When indexing records by file
+        Then only enough products for the preview should be kept, with the line count intact
+        """
+        generator = InvoiceSummaryGenerator()
+        records = [
+            FlatInvoiceRecord(vendor_name="Bulk Vendor", item_description=f"Product {i}", file_path="bulk.pdf")
+            for i in range(300)
+        ]
+        
+        entry = generator._index_by_file(records)["bulk.pdf"]
+        
+        assert entry["products"] == ["Product 0", "Product 1", "Product 2"]
+        assert entry["count"] == 300
 
 
 class TestSummaryGeneratorIntegration:
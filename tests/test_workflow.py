@@ -1,16 +1,43 @@
 """
 Unit tests for workflow functionality
 """
+import os
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, patch, MagicMock
 from pathlib import Path
 from datetime import datetime
+from types import SimpleNamespace
+import pandas as pd
 
 from invoice_processor.workflows.invoice_workflow import (
     extract_text_from_file, extract_invoice_structure, flatten_invoice_data,
     save_results_to_csv, process_invoices
 )
-from invoice_processor.models.invoice import Invoice, InvoiceHeader, InvoiceLineItem
+from invoice_processor.models.invoice import FlatInvoiceRecord, Invoice, InvoiceHeader, InvoiceLineItem
+
+
+def _write_text_pdf(path: Path, text: str) -> None:
+    """Write a one-page PDF whose page content draws the given line of text"""
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    content = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(content))
+        content += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(content)
+    content += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    content += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    content += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(content)
 
 
 class TestExtractTextFromFile:
@@ -29,6 +56,21 @@ class TestExtractTextFromFile:
             
             assert result == "PDF text content"
     
+    def test_extract_text_reuses_extractor(self, sample_pdf_file):
+        """
+        Given several PDF files to extract
+        When extracting text from each
+        Then a single PDFExtractor should be created and reused
+        """
+        with patch('invoice_processor.workflows.invoice_workflow.PDFExtractor') as mock_pdf:
+            mock_pdf.return_value.extract_text.return_value = "PDF text content " * 5
+            
+            extract_text_from_file(sample_pdf_file)
+            extract_text_from_file(sample_pdf_file)
+            
+            mock_pdf.assert_called_once()
+            assert mock_pdf.return_value.extract_text.call_count == 2
+    
     def test_extract_text_from_pdf_with_ocr_fallback(self, sample_pdf_file):
         """
         Given a PDF with no extractable text
@@ -45,6 +87,7 @@ class TestExtractTextFromFile:
             
             result = extract_text_from_file(sample_pdf_file)
             
+            assert result == "Page 1:\nOCR page text\n\nPage 2:\nOCR page text"
             assert "Page 1:" in result
             assert "OCR page text" in result
     
@@ -111,6 +154,18 @@ class TestExtractInvoiceStructure:
             assert len(result.line_items) == 1
             assert "AI extraction failed" in result.line_items[0].item_description
     
+    def test_extract_structure_skips_ai_without_invoice_keywords(self):
+        """
+        Given text with no invoice keywords or currency symbols
+        When extracting invoice structure
+        Then AI should not be called and basic structure should be created
+        """
+        with patch('invoice_processor.workflows.invoice_workflow.AIExtractor') as mock_ai:
+            result = extract_invoice_structure("Lorem ipsum dolor sit amet consectetur adipiscing", "photo.jpg")
+            
+            mock_ai.return_value.extract_invoice_data.assert_not_called()
+            assert result.header.vendor_name == "Unknown (OCR only)"
+    
     def test_extract_structure_insufficient_text(self):
         """
         Given insufficient text content
@@ -180,6 +235,22 @@ class TestFlattenInvoiceData:
             
             assert all(record.processing_timestamp == "2024-01-01T12:00:00" for record in result)
 
+    def test_flatten_copies_only_record_fields(self, sample_invoice):
+        """
+        Given an invoice whose header and line items carry extra attributes
+        When flattening data
+        Then records should hold only FlatInvoiceRecord fields
+        """
+        header = SimpleNamespace(**dict(sample_invoice.header), internal_note="not a record field")
+        line_item = SimpleNamespace(**dict(sample_invoice.line_items[0]), internal_note="not a record field")
+        invoice = SimpleNamespace(header=header, line_items=[line_item], file_path="extra.pdf")
+        
+        result = flatten_invoice_data(invoice)
+        
+        assert set(vars(result[0])) == set(FlatInvoiceRecord.model_fields)
+        assert result[0].item_description == line_item.item_description
+        assert result[0].vendor_name == header.vendor_name
+
 
 class TestSaveResultsToCSV:
     """Test CSV saving functionality"""
@@ -200,6 +271,35 @@ class TestSaveResultsToCSV:
             assert "Successfully saved" in result
             assert str(len(sample_flat_records)) in result
     
+    def test_save_results_writes_all_fields(self, sample_flat_records, temp_dir):
+        """
+        Given flat records
+        When saving to CSV
+        Then every record field should be written as a column, one row per record
+        """
+        output_file = temp_dir / "fields_output.csv"
+        
+        save_results_to_csv(sample_flat_records, output_file)
+        
+        df = pd.read_csv(output_file)
+        assert list(df.columns) == list(sample_flat_records[0].model_dump())
+        assert df["invoice_number"].tolist() == ["INV-001", "INV-002"]
+        assert df["line_total"].tolist() == [500.0, 300.0]
+    
+    def test_save_results_csv_writer_matches_pandas(self, sample_flat_records, temp_dir):
+        """
+        Given flat records with empty optional fields
+        When saving with the csv writer and with pandas
+        Then both files should read back identically
+        """
+        csv_file = temp_dir / "csv_writer.csv"
+        pandas_file = temp_dir / "pandas.csv"
+        
+        save_results_to_csv(sample_flat_records, csv_file)
+        save_results_to_csv(sample_flat_records, pandas_file, use_pandas=True)
+        
+        pd.testing.assert_frame_equal(pd.read_csv(csv_file), pd.read_csv(pandas_file))
+    
     def test_save_results_empty_records(self, temp_dir):
         """
         Given empty records list
@@ -265,6 +365,63 @@ class TestProcessInvoices:
             assert "Successfully processed" in result
             assert "invoices" in result
     
+    def test_process_invoices_parallel_keeps_file_order(self, input_directory_structure, temp_dir):
+        """
+        Given several input files and max_workers > 1
+        When processing invoices
+        Then files should be processed by the pool, with records kept in file order and progress reported
+        """
+        progress = []
+        
+        with patch('invoice_processor.workflows.invoice_workflow.ProcessPoolExecutor', ThreadPoolExecutor), \
+             patch('invoice_processor.workflows.invoice_workflow.set_render_threads') as mock_set_threads, \
+             patch('invoice_processor.workflows.invoice_workflow.extract_text_from_file') as mock_extract, \
+             patch('invoice_processor.workflows.invoice_workflow.extract_invoice_structure') as mock_structure, \
+             patch('invoice_processor.workflows.invoice_workflow.flatten_invoice_data') as mock_flatten, \
+             patch('invoice_processor.workflows.invoice_workflow.save_results_to_csv') as mock_save, \
+             patch('invoice_processor.workflows.invoice_workflow.move_processed_file'), \
+             patch('invoice_processor.workflows.invoice_workflow.InvoiceSummaryGenerator'):
+            
+            mock_extract.side_effect = lambda file_path: str(file_path)
+            mock_structure.side_effect = lambda text, file_path: Mock(file_path=file_path)
+            mock_flatten.side_effect = lambda invoice: [invoice.file_path]
+            
+            result = process_invoices(
+                str(input_directory_structure), str(temp_dir / "output"), str(temp_dir / "processed"),
+                max_workers=2, on_progress=lambda completed, total: progress.append((completed, total))
+            )
+            
+            saved_records = mock_save.call_args.args[0]
+            assert "Successfully processed 4 invoices" in result
+            assert saved_records == sorted(saved_records)
+            assert progress[-1] == (4, 4)
+            mock_set_threads.assert_called_with(max(1, (os.cpu_count() or 1) // 2))
+    
+    def test_process_invoices_in_worker_processes(self, temp_dir, monkeypatch):
+        """
+        Given two small text PDFs and no AI providers
+        When processing invoices with a real process pool
+        Then text should be extracted in worker processes and both files processed and moved
+        """
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+        monkeypatch.setattr('invoice_processor.extractors.pdf_extractor.pdfium', None)
+        
+        input_dir = temp_dir / "input"
+        (input_dir / "vendor_a").mkdir(parents=True)
+        _write_text_pdf(input_dir / "first.pdf", "Invoice INV-1 from Vendor A, total amount due 100.00")
+        _write_text_pdf(input_dir / "vendor_a" / "second.pdf", "Invoice INV-2 from Vendor A, total amount due 250.00")
+        processed_dir = temp_dir / "processed"
+        
+        result = process_invoices(str(input_dir), str(temp_dir / "output"), str(processed_dir), max_workers=2)
+        
+        assert "Successfully processed 2 invoices" in result
+        assert (processed_dir / "first.pdf").exists()
+        assert (processed_dir / "vendor_a" / "second.pdf").exists()
+        csv_text = next((temp_dir / "output").glob("processed_invoices_*.csv")).read_text()
+        assert "INV-1 from Vendor A" in csv_text
+        assert "INV-2 from Vendor A" in csv_text
+    
     def test_process_invoices_no_files(self, temp_dir):
         """
         Given empty input directory